@@ -0,0 +1,17 @@
+import asyncio
+import weakref
+
+import redis.asyncio
+from django.conf import settings
+
+# redis.asyncio connections are bound to the event loop that opened them, so one client is kept per loop
+_connections = weakref.WeakKeyDictionary()
+
+
+def get_async_redis_connection():
+    loop = asyncio.get_running_loop()
+    connection = _connections.get(loop)
+    if connection is None:
+        connection = redis.asyncio.Redis.from_url(settings.CACHES['default']['LOCATION'])
+        _connections[loop] = connection
+    return connection
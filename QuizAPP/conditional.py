@@ -0,0 +1,31 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest())
+
+
+def not_modified(request, etag, last_modified=None):
+    """Returns a 304 (or 412) response when the client's validators still match, otherwise None."""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    response = get_conditional_response(request, etag=etag,
+                                        last_modified=int(last_modified.timestamp()) if last_modified else None)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified=None, max_age=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Clients may keep the response but, unless a max_age is given, have to revalidate it before every use
+    if max_age:
+        patch_cache_control(response, private=True, max_age=max_age)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,201 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    __slots__ = ('queries', 'query_time', 'cache_hits', 'cache_misses', 'sql', 'parent')
+
+    def __init__(self, record_sql=False, parent=None):
+        self.queries = 0
+        self.query_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.sql = [] if record_sql else None
+        # Collections nest (a benchmark around the middleware, say) and every enclosing one sees the activity.
+        self.parent = parent
+
+
+@contextmanager
+def collect(record_sql=False):
+    # The stats live in a context variable, so queries run by sync_to_async in another thread are
+    # still attributed to the request that awaited them.
+    stats = RequestStats(record_sql, _current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        while stats is not None:
+            stats.queries += 1
+            stats.query_time += elapsed
+            if stats.sql is not None:
+                stats.sql.append((sql, elapsed))
+            stats = stats.parent
+
+
+def record_cache(hit):
+    stats = _current.get()
+    while stats is not None:
+        if hit:
+            stats.cache_hits += 1
+        else:
+            stats.cache_misses += 1
+        stats = stats.parent
+
+
+def _install(sender=None, connection=None, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def track_queries():
+    # Database connections are per thread, so the wrapper is attached to every connection as it opens.
+    connection_created.connect(_install, dispatch_uid='QuizAPP.metrics.track_queries')
+    for connection in connections.all(initialized_only=True):
+        _install(connection=connection)
+
+
+class Registry:
+    """Per-process request metrics, rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = {}
+        self.durations = {}
+        self.views = {}
+
+    def observe(self, view, method, status, duration, size, stats):
+        with self.lock:
+            key = (view, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+            buckets = self.durations.get((view, method))
+            if buckets is None:
+                buckets = self.durations[(view, method)] = [0] * len(DURATION_BUCKETS) + [0, 0.0]
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    buckets[index] += 1
+            buckets[-2] += 1
+            buckets[-1] += duration
+
+            totals = self.views.get(view)
+            if totals is None:
+                totals = self.views[view] = {'queries': 0, 'query_time': 0.0, 'cache_hits': 0, 'cache_misses': 0,
+                                             'response_bytes': 0}
+            totals['queries'] += stats.queries
+            totals['query_time'] += stats.query_time
+            totals['cache_hits'] += stats.cache_hits
+            totals['cache_misses'] += stats.cache_misses
+            totals['response_bytes'] += size
+
+    def render(self, pool_stats=None, cache_stats=None):
+        with self.lock:
+            requests = dict(self.requests)
+            durations = {key: list(buckets) for key, buckets in self.durations.items()}
+            views = {view: dict(totals) for view, totals in self.views.items()}
+
+        lines = [
+            '# HELP quizapp_http_requests_total Requests handled, by view, method and status.',
+            '# TYPE quizapp_http_requests_total counter',
+        ]
+        for (view, method, status), count in sorted(requests.items()):
+            lines.append(f'quizapp_http_requests_total{labels(view=view, method=method, status=status)} {count}')
+
+        lines += [
+            '# HELP quizapp_http_request_duration_seconds Wall time spent handling requests.',
+            '# TYPE quizapp_http_request_duration_seconds histogram',
+        ]
+        for (view, method), buckets in sorted(durations.items()):
+            for bound, count in zip(DURATION_BUCKETS, buckets):
+                lines.append(f'quizapp_http_request_duration_seconds_bucket'
+                             f'{labels(view=view, method=method, le=bound)} {count}')
+            lines.append(f'quizapp_http_request_duration_seconds_bucket'
+                         f'{labels(view=view, method=method, le="+Inf")} {buckets[-2]}')
+            lines.append(f'quizapp_http_request_duration_seconds_count{labels(view=view, method=method)} {buckets[-2]}')
+            lines.append(f'quizapp_http_request_duration_seconds_sum{labels(view=view, method=method)} {buckets[-1]}')
+
+        for name, key, kind, help_text in (
+            ('quizapp_db_queries_total', 'queries', 'counter', 'Database queries run.'),
+            ('quizapp_db_query_duration_seconds_total', 'query_time', 'counter', 'Time spent in database queries.'),
+            ('quizapp_response_bytes_total', 'response_bytes', 'counter', 'Response body bytes sent.'),
+        ):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            for view, totals in sorted(views.items()):
+                lines.append(f'{name}{labels(view=view)} {totals[key]}')
+
+        lines += [
+            '# HELP quizapp_cache_lookups_total Application cache lookups, by result.',
+            '# TYPE quizapp_cache_lookups_total counter',
+        ]
+        for view, totals in sorted(views.items()):
+            lines.append(f'quizapp_cache_lookups_total{labels(view=view, result="hit")} {totals["cache_hits"]}')
+            lines.append(f'quizapp_cache_lookups_total{labels(view=view, result="miss")} {totals["cache_misses"]}')
+
+        if pool_stats:
+            lines += [
+                '# HELP quizapp_db_pool Database connection pool statistics.',
+                '# TYPE quizapp_db_pool gauge',
+            ]
+            for alias, stats in sorted(pool_stats.items()):
+                for stat, value in sorted(stats.items()):
+                    lines.append(f'quizapp_db_pool{labels(alias=alias, stat=stat)} {value}')
+
+        if cache_stats:
+            lines += [
+                '# HELP quizapp_cache_tier_lookups_total Lookups per tier of the two-tier caches, by result.',
+                '# TYPE quizapp_cache_tier_lookups_total counter',
+            ]
+            for alias, tiers in sorted(cache_stats.items()):
+                for tier, stats in sorted(tiers.items()):
+                    for result, field in (('hit', 'hits'), ('miss', 'misses')):
+                        lines.append(f'quizapp_cache_tier_lookups_total{labels(alias=alias, tier=tier, result=result)} '
+                                     f'{stats[field]}')
+            lines += [
+                '# HELP quizapp_cache_tier_hit_ratio Share of lookups answered by each tier of the two-tier caches.',
+                '# TYPE quizapp_cache_tier_hit_ratio gauge',
+            ]
+            for alias, tiers in sorted(cache_stats.items()):
+                for tier, stats in sorted(tiers.items()):
+                    if stats['hit_ratio'] is not None:
+                        lines.append(f'quizapp_cache_tier_hit_ratio{labels(alias=alias, tier=tier)} '
+                                     f'{stats["hit_ratio"]}')
+            lines += [
+                '# HELP quizapp_cache_local_entries Entries held in the in-process cache tier.',
+                '# TYPE quizapp_cache_local_entries gauge',
+            ]
+            for alias, tiers in sorted(cache_stats.items()):
+                lines.append(f'quizapp_cache_local_entries{labels(alias=alias)} {tiers["local"]["entries"]}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def labels(**values):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(values, escaped)) + '}'
+
+
+registry = Registry()
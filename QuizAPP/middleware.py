@@ -0,0 +1,85 @@
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.deprecation import MiddlewareMixin
+
+from . import metrics
+
+logger = logging.getLogger('QuizAPP.metrics')
+
+
+class MetricsMiddleware:
+    """
+    Records wall time, database queries, cache lookups and response size per view.
+
+    Removed from the stack at startup unless METRICS_ENABLED is set, so it costs nothing when disabled.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.server_timing = settings.METRICS_SERVER_TIMING
+        self.slow_request = settings.METRICS_SLOW_REQUEST_MS / 1000
+        self.sql_sample_rate = settings.METRICS_SQL_SAMPLE_RATE
+        metrics.track_queries()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        with metrics.collect(self.sample_sql()) as stats:
+            started = time.perf_counter()
+            response = self.get_response(request)
+            return self.finish(request, response, time.perf_counter() - started, stats)
+
+    async def __acall__(self, request):
+        with metrics.collect(self.sample_sql()) as stats:
+            started = time.perf_counter()
+            response = await self.get_response(request)
+            return self.finish(request, response, time.perf_counter() - started, stats)
+
+    def sample_sql(self):
+        return self.sql_sample_rate > 0 and random.random() < self.sql_sample_rate
+
+    def finish(self, request, response, duration, stats):
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        size = 0 if response.streaming else len(response.content)
+        metrics.registry.observe(view, request.method, response.status_code, duration, size, stats)
+
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'db;dur={stats.query_time * 1000:.1f};desc="{stats.queries} queries", '
+                f'cache;desc="{stats.cache_hits} hits {stats.cache_misses} misses", '
+                f'app;dur={duration * 1000:.1f}'
+            )
+
+        if stats.sql is not None and duration >= self.slow_request:
+            logger.warning(
+                'Slow request %s %s (%s) took %.0f ms with %d queries:\n%s',
+                request.method, request.path, view, duration * 1000, stats.queries,
+                '\n'.join(f'{elapsed * 1000:.1f} ms  {sql}' for sql, elapsed in stats.sql),
+            )
+        return response
+
+
+class RateLimitHeadersMiddleware(MiddlewareMixin):
+    """Reports the budget left in the token bucket a throttled view drew from."""
+
+    def process_response(self, request, response):
+        bucket = getattr(request, 'rate_limit', None)
+        if bucket is not None:
+            response['X-RateLimit-Limit'] = bucket.capacity
+            response['X-RateLimit-Remaining'] = int(bucket.remaining)
+            response['X-RateLimit-Reset'] = bucket.reset
+        return response
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import tiered_cache
+from .metrics import registry
+
+
+def database_pool_stats():
+    stats = {}
+    for alias in connections:
+        pool = getattr(connections[alias], 'pool', None)
+        if pool is not None:
+            stats[alias] = pool.get_stats()
+    return stats
+
+
+def cache_tier_stats():
+    # Read from the process-wide tier state, caches[alias] would build a fresh backend in a new thread
+    return {alias: tiered_cache.get_state(params['LOCATION'], params).stats()
+            for alias, params in settings.CACHES.items() if params['BACKEND'] == 'QuizAPP.tiered_cache.TieredCache'}
+
+
+class DatabasePoolView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(database_pool_stats())
+
+
+class CacheTierView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_tier_stats())
+
+
+def metrics_view(request):
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    if settings.METRICS_TOKEN and not constant_time_compare(request.headers.get('Authorization', ''),
+                                                            f'Bearer {settings.METRICS_TOKEN}'):
+        return HttpResponse(status=401)
+    return HttpResponse(registry.render(database_pool_stats(), cache_tier_stats()),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
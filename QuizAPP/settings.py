@@ -10,12 +10,19 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
+import sys
+from datetime import timedelta
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
+def env_flag(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
 
@@ -38,12 +45,15 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'account.apps.AccountConfig',
     'quiz.apps.QuizConfig'
 ]
 
 MIDDLEWARE = [
+    'QuizAPP.middleware.MetricsMiddleware',
+    'QuizAPP.middleware.RateLimitHeadersMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,6 +65,18 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'QuizAPP.urls'
 
+# Request metrics, scraped from /metrics. The middleware removes itself when disabled.
+METRICS_ENABLED = env_flag('METRICS_ENABLED', False)
+METRICS_SERVER_TIMING = env_flag('METRICS_SERVER_TIMING', False)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# A share of requests keeps its SQL, which is logged if the request turns out slower than the threshold.
+METRICS_SQL_SAMPLE_RATE = float(os.environ.get('METRICS_SQL_SAMPLE_RATE', 0.1))
+METRICS_SLOW_REQUEST_MS = float(os.environ.get('METRICS_SLOW_REQUEST_MS', 500))
+
+# Buffer quiz rewards in Redis and apply them in bulk with the flush_scores command instead of updating
+# the player row on every finished game.
+SCORE_WRITE_BEHIND = env_flag('SCORE_WRITE_BEHIND', False)
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -81,14 +103,32 @@ WSGI_APPLICATION = 'QuizAPP.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'quiz_app',
-        'USER': 'quiz_app_user',
-        'PASSWORD': '1234',
-        'HOST': 'localhost',
-        'PORT': '5432',
+        'NAME': os.environ.get('DB_NAME', 'quiz_app'),
+        'USER': os.environ.get('DB_USER', 'quiz_app_user'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', '1234'),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        # With the pool enabled Django passes ConnectionPool.check_connection to it as its check instead, so a
+        # pooled connection is checked before it is handed out (and 'check' must not be set in OPTIONS['pool'])
+        'CONN_HEALTH_CHECKS': env_flag('DB_CONN_HEALTH_CHECKS', True),
     }
 }
 
+# Connection pooling (psycopg 3 pool), falls back to persistent connections when disabled
+# https://docs.djangoproject.com/en/5.1/ref/databases/#connection-pool
+if env_flag('DB_POOL', True):
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'name': 'default',
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+            'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', 3600)),
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        },
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60))
 
 
 
@@ -135,6 +175,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Account
 AUTH_USER_MODEL = 'account.Player'
+ACCESS_TOKEN_LIFETIME = timedelta(minutes=15)
+REFRESH_TOKEN_LIFETIME = timedelta(days=7)
 
 # Django Rest Framework
 REST_FRAMEWORK = {
@@ -142,7 +184,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny'
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.BasicAuthentication',
+        'account.authentication.TokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_RENDERER_CLASSES': [
@@ -153,17 +195,47 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # Token buckets (QuizAPP.throttling): '10/min' allows a burst of 10 and refills one request every 6 seconds
+    'DEFAULT_THROTTLE_RATES': {
+        'login': os.environ.get('THROTTLE_LOGIN', '5/min'),
+        'register': os.environ.get('THROTTLE_REGISTER', '3/min'),
+        'start_quiz': os.environ.get('THROTTLE_START_QUIZ', '20/min'),
+        'finish_quiz': os.environ.get('THROTTLE_FINISH_QUIZ', '20/min'),
+    },
+    # Number of proxies in front of the app, clients are only told apart by X-Forwarded-For when this is set
+    'NUM_PROXIES': int(os.environ['NUM_PROXIES']) if os.environ.get('NUM_PROXIES') else None,
 }
+THROTTLE_ENABLED = env_flag('THROTTLE_ENABLED', True)
 
 # Redis
+# The test suite clears buffers, buckets and boards as it goes, so it runs against its own database (and
+# invalidation channel) rather than the one holding unflushed development data
+TESTING = sys.argv[1:2] == ['test']
+if TESTING:
+    REDIS_URL = os.environ.get('REDIS_TEST_URL', 'redis://127.0.0.1:6379/15')
+else:
+    REDIS_URL = os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1')
+
 CACHES = {
     'default': {
         'BACKEND': 'django_redis.cache.RedisCache',
-        'LOCATION': 'redis://127.0.0.1:6379/1',
+        'LOCATION': REDIS_URL,
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
         }
-    }
+    },
+    # Rarely changing quiz data (answer keys, question bundles, versions), served from a per-process LRU in
+    # front of Redis and kept coherent through pub/sub invalidation, see QuizAPP.tiered_cache
+    'tiered': {
+        'BACKEND': 'QuizAPP.tiered_cache.TieredCache',
+        'LOCATION': REDIS_URL,
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'LOCAL_MAX_ENTRIES': int(os.environ.get('CACHE_LOCAL_MAX_ENTRIES', 1024)),
+            'LOCAL_TIMEOUT': float(os.environ.get('CACHE_LOCAL_TIMEOUT', 60)),
+            'INVALIDATION_CHANNEL': 'cache:invalidate:test' if TESTING else 'cache:invalidate',
+        }
+    },
 }
 SESSION_ENGINE = "django.contrib.sessions.backends.cache"
 SESSION_CACHE_ALIAS = "default"
@@ -0,0 +1,133 @@
+import math
+from typing import NamedTuple
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .async_redis import get_async_redis_connection
+
+# Refills the bucket for the time passed since the last request and takes a token if one is left, in one step.
+# The Redis clock is used so every worker agrees on it. ARGV are the capacity and the refill rate per second,
+# the result is whether the request is allowed, the tokens left and the seconds until the next token.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(tokens), tostring(math.max(0, 1 - tokens) / rate)}
+"""
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+_script = None
+
+
+class Bucket(NamedTuple):
+    allowed: bool
+    capacity: int
+    remaining: float
+    wait: float
+    rate: float
+
+    @property
+    def reset(self):
+        # Seconds until the bucket is full again
+        return math.ceil((self.capacity - self.remaining) / self.rate)
+
+
+def parse_rate(rate):
+    """'10/min' allows bursts of 10 requests and refills one token every 6 seconds."""
+    if rate is None:
+        return None
+    capacity, period = rate.split('/')
+    return int(capacity), int(capacity) / PERIODS[period[0]]
+
+
+def bucket_key(scope, ident):
+    return f'throttle:{scope}:{ident}'
+
+
+def _bucket(result, capacity, rate):
+    allowed, remaining, wait = result
+    return Bucket(bool(allowed), capacity, float(remaining), float(wait), rate)
+
+
+def consume(scope, ident, capacity, rate):
+    global _script
+    connection = get_redis_connection('default')
+    if _script is None:
+        _script = connection.register_script(TOKEN_BUCKET_SCRIPT)
+    return _bucket(_script(keys=[bucket_key(scope, ident)], args=[capacity, rate], client=connection), capacity, rate)
+
+
+async def aconsume(scope, ident, capacity, rate):
+    connection = get_async_redis_connection()
+    script = connection.register_script(TOKEN_BUCKET_SCRIPT)
+    return _bucket(await script(keys=[bucket_key(scope, ident)], args=[capacity, rate], client=connection),
+                   capacity, rate)
+
+
+def get_rate(scope):
+    return parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(scope))
+
+
+def remember(request, bucket):
+    # Read by RateLimitHeadersMiddleware, the most restrictive bucket of the request is reported
+    request = getattr(request, '_request', request)
+    current = getattr(request, 'rate_limit', None)
+    if current is None or bucket.remaining < current.remaining:
+        request.rate_limit = bucket
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket per view scope (the view's throttle_scope) and client: the player when authenticated,
+    otherwise the IP address. Rates come from REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'].
+    """
+
+    def get_client(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+    def get_ident(self, request):
+        # DRF trusts X-Forwarded-For while NUM_PROXIES is unset, so anyone could pick a fresh bucket per request
+        if api_settings.NUM_PROXIES is None:
+            return request.META.get('REMOTE_ADDR')
+        return super().get_ident(request)
+
+    def allow_request(self, request, view):
+        self.bucket = None
+        scope = getattr(view, 'throttle_scope', None)
+        rate = get_rate(scope) if scope and settings.THROTTLE_ENABLED else None
+        if rate is None:
+            return True
+
+        self.bucket = consume(scope, self.get_client(request), *rate)
+        remember(request, self.bucket)
+        return self.bucket.allowed
+
+    def wait(self):
+        return self.bucket.wait if self.bucket else None
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """Limits by IP address even for authenticated players, so many accounts cannot share one budget."""
+
+    def get_client(self, request):
+        return f'ip:{self.get_ident(request)}'
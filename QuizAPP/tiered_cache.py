@@ -0,0 +1,261 @@
+import itertools
+import json
+import logging
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django_redis.cache import RedisCache
+
+logger = logging.getLogger('QuizAPP.tiered_cache')
+
+_missing = object()
+
+
+class LocalTier:
+    """Bounded LRU of pickled values with per-entry expiry, shared by the threads of one process."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _missing
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return _missing
+            self.entries.move_to_end(key)
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout):
+        # Pickled like LocMemCache, so a caller mutating what it got back cannot change the cached value
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + timeout, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class TierState:
+    """
+    What the workers' threads share: the local tier, the hit counters and the invalidation listener.
+
+    Django builds a cache backend per thread (and per async context), so this lives at process level in _states,
+    one per cache configuration.
+    """
+
+    def __init__(self, channel, max_entries):
+        self.channel = channel
+        self.local = LocalTier(max_entries)
+        self.sender = uuid.uuid4().hex
+        # Changes with every invalidation; a value read from Redis while one arrived may be stale and is not kept
+        self.generations = itertools.count(1)
+        self.generation = 0
+        self.subscriber = None
+        self.lock = threading.Lock()
+        self.counters = {'local_hits': 0, 'local_misses': 0, 'redis_hits': 0, 'redis_misses': 0}
+
+    def count(self, name, amount=1):
+        # Unlocked on purpose, the counters only feed hit ratios
+        self.counters[name] += amount
+
+    def evict(self, keys):
+        self.generation = next(self.generations)
+        if keys is None:
+            self.local.clear()
+        else:
+            self.local.delete(keys)
+
+    def subscribe(self, client):
+        if self.subscriber is not None:
+            return
+        with self.lock:
+            if self.subscriber is None:
+                self.subscriber = threading.Thread(target=self.listen, args=(client,), daemon=True,
+                                                   name=f'{self.channel} listener')
+                self.subscriber.start()
+
+    def listen(self, client):
+        while True:
+            try:
+                pubsub = client.get_client(write=False).pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # Messages sent while not subscribed are lost, so nothing cached before can be trusted
+                self.evict(None)
+                for message in pubsub.listen():
+                    data = json.loads(message['data'])
+                    if data['sender'] != self.sender:
+                        self.evict(data['keys'])
+            except Exception:
+                logger.exception('Cache invalidation subscription failed, reconnecting')
+                time.sleep(1)
+
+    def stats(self):
+        counters = dict(self.counters)
+        stats = {}
+        for tier in ('local', 'redis'):
+            hits, misses = counters[f'{tier}_hits'], counters[f'{tier}_misses']
+            stats[tier] = {'hits': hits, 'misses': misses,
+                           'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None}
+        stats['local']['entries'] = len(self.local.entries)
+        return stats
+
+
+_states = {}
+_states_lock = threading.Lock()
+
+
+def state_key(server, params):
+    channel = params.get('OPTIONS', {}).get('INVALIDATION_CHANNEL', 'cache:invalidate')
+    return server, params.get('KEY_PREFIX', ''), channel
+
+
+def get_state(server, params):
+    key = state_key(server, params)
+    with _states_lock:
+        state = _states.get(key)
+        if state is None:
+            state = _states[key] = TierState(key[2], params.get('OPTIONS', {}).get('LOCAL_MAX_ENTRIES', 1024))
+    return state
+
+
+class TieredCache(RedisCache):
+    """
+    django_redis with a per-process LRU in front of it.
+
+    Reads are answered from the local tier when possible and fill it from Redis otherwise. Every write publishes
+    the keys it changed on a Redis channel and each process evicts them from its own tier. Local entries live for
+    LOCAL_TIMEOUT seconds, which bounds how long a value can stay stale should a message be lost (or outlive its
+    Redis expiry), and the tier is emptied whenever the subscription has to reconnect.
+
+    OPTIONS (besides the django_redis ones): LOCAL_MAX_ENTRIES, LOCAL_TIMEOUT and INVALIDATION_CHANNEL.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        self.state = get_state(server, params)
+        self.local_timeout = params.get('OPTIONS', {}).get('LOCAL_TIMEOUT', 60)
+
+    def local_get(self, full_key):
+        value = self.state.local.get(full_key)
+        self.state.count('local_misses' if value is _missing else 'local_hits')
+        return value
+
+    def local_fill(self, full_key, value, generation):
+        if generation == self.state.generation:
+            self.state.local.set(full_key, value, self.local_timeout)
+
+    def get(self, key, default=None, version=None, client=None):
+        full_key = self.make_key(key, version)
+        value = self.local_get(full_key)
+        if value is not _missing:
+            return value
+        return self.get_remote(key, full_key, default, version, client)
+
+    async def aget(self, key, default=None, version=None):
+        # Local hits skip the thread hop of the sync_to_async fallback
+        full_key = self.make_key(key, version)
+        value = self.local_get(full_key)
+        if value is not _missing:
+            return value
+        return await sync_to_async(self.get_remote)(key, full_key, default, version)
+
+    def get_remote(self, key, full_key, default, version, client=None):
+        self.state.subscribe(self.client)
+        generation = self.state.generation
+        value = super().get(key, _missing, version, client)
+        if value is _missing:
+            self.state.count('redis_misses')
+            return default
+        self.state.count('redis_hits')
+        self.local_fill(full_key, value, generation)
+        return value
+
+    def get_many(self, keys, version=None, client=None):
+        found = {}
+        remote = []
+        for key in keys:
+            value = self.local_get(self.make_key(key, version))
+            if value is _missing:
+                remote.append(key)
+            else:
+                found[key] = value
+        if not remote:
+            return found
+
+        self.state.subscribe(self.client)
+        generation = self.state.generation
+        values = super().get_many(remote, version=version, client=client)
+        self.state.count('redis_hits', len(values))
+        self.state.count('redis_misses', len(remote) - len(values))
+        for key, value in values.items():
+            self.local_fill(self.make_key(key, version), value, generation)
+        return found | values
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None, nx=False, xx=False):
+        result = super().set(key, value, timeout=timeout, version=version, client=client, nx=nx, xx=xx)
+        self.invalidate([self.make_key(key, version)])
+        return result
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+        result = super().add(key, value, timeout=timeout, version=version, client=client)
+        if result:
+            self.invalidate([self.make_key(key, version)])
+        return result
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+        result = super().set_many(data, timeout=timeout, version=version, client=client)
+        self.invalidate([self.make_key(key, version) for key in data])
+        return result
+
+    def delete(self, key, version=None, prefix=None, client=None):
+        result = super().delete(key, version=version, prefix=prefix, client=client)
+        self.invalidate([self.make_key(key, version)])
+        return result
+
+    def delete_many(self, keys, version=None, client=None):
+        result = super().delete_many(keys, version=version, client=client)
+        self.invalidate([self.make_key(key, version) for key in keys])
+        return result
+
+    def incr(self, key, delta=1, version=None, client=None, ignore_key_check=False):
+        result = super().incr(key, delta=delta, version=version, client=client, ignore_key_check=ignore_key_check)
+        self.invalidate([self.make_key(key, version)])
+        return result
+
+    def decr(self, key, delta=1, version=None, client=None):
+        result = super().decr(key, delta=delta, version=version, client=client)
+        self.invalidate([self.make_key(key, version)])
+        return result
+
+    def clear(self):
+        result = super().clear()
+        self.invalidate(None)
+        return result
+
+    def invalidate(self, keys):
+        self.state.evict(keys)
+        message = json.dumps({'sender': self.state.sender, 'keys': keys})
+        self.client.get_client(write=True).publish(self.state.channel, message)
+
+    def stats(self):
+        return self.state.stats()
@@ -16,9 +16,13 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from .monitoring import CacheTierView, DatabasePoolView, metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/account/', include('account.urls', namespace='account')),
     path('api/quiz/', include('quiz.urls', namespace='quiz')),
+    path('api/monitoring/db-pool/', DatabasePoolView.as_view(), name='db-pool'),
+    path('api/monitoring/cache/', CacheTierView.as_view(), name='cache-tiers'),
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Player
+from .models import Player, ScoreFlush
+from quiz.caches import invalidate_author
+from . import leaderboard
 from django.contrib.auth.models import Group
 
 admin.site.unregister(Group)
@@ -30,3 +32,15 @@ class PlayerAdmin(admin.ModelAdmin):
     )
 
     readonly_fields = ('created_at', 'updated_at')
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        leaderboard.sync(obj)
+        if change and 'display_name' in form.changed_data:
+            invalidate_author(obj.pk)
+
+
+@admin.register(ScoreFlush)
+class ScoreFlushAdmin(admin.ModelAdmin):
+    list_display = ('batch_id', 'players', 'total', 'flushed_at')
+    date_hierarchy = 'flushed_at'
@@ -0,0 +1,225 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from QuizAPP.async_redis import get_async_redis_connection
+from .models import Player
+from . import score_buffer
+
+GLOBAL_BOARD = 'leaderboard:global'
+STAGING_SUFFIX = ':rebuild'
+
+# Updates the global board and moves the player to the league board matching the new score, atomically.
+# KEYS are the global board followed by the league boards from the highest league down to no_league, then the
+# staging copies of the same boards that rebuild() fills. ARGV are the amount, the player id, a seed score and
+# the league thresholds. Without a seed the amount is added to the player's score, and a player who is not on the
+# board yet is left alone (nil is returned so the caller can seed them). A seed is the player's whole score and is
+# set as-is. While a rebuild runs, players it already staged get the same change on the staging boards.
+RECORD_SCRIPT = """
+local boards = #KEYS / 2
+local function place(offset, score)
+    local target = boards
+    for i = 2, boards - 1 do
+        if tonumber(score) >= tonumber(ARGV[i + 2]) then
+            target = i
+            break
+        end
+    end
+    for i = 1, boards do
+        if i == 1 or i == target then
+            redis.call('ZADD', KEYS[offset + i], score, ARGV[2])
+        else
+            redis.call('ZREM', KEYS[offset + i], ARGV[2])
+        end
+    end
+end
+
+local score = ARGV[3]
+if score == '' then
+    if not redis.call('ZSCORE', KEYS[1], ARGV[2]) then
+        return false
+    end
+    score = redis.call('ZINCRBY', KEYS[1], ARGV[1], ARGV[2])
+end
+place(0, score)
+
+if redis.call('ZSCORE', KEYS[boards + 1], ARGV[2]) then
+    local staged = score
+    if ARGV[3] == '' then
+        staged = redis.call('ZINCRBY', KEYS[boards + 1], ARGV[1], ARGV[2])
+    end
+    place(boards, staged)
+end
+return score
+"""
+
+_record_script = None
+
+
+def board_key(league=None):
+    return f'leaderboard:{league}' if league else GLOBAL_BOARD
+
+
+def staging_key(board):
+    return f'{board}{STAGING_SUFFIX}'
+
+
+def get_connection():
+    return get_redis_connection('default')
+
+
+def _boards():
+    leagues = [league for _, league in Player.LEAGUE_THRESHOLDS] + [Player.League.NO_LEAGUE]
+    return [GLOBAL_BOARD] + [board_key(league) for league in leagues]
+
+
+def _record_arguments(player_id, amount, seed=None):
+    boards = _boards()
+    thresholds = [threshold for threshold, _ in Player.LEAGUE_THRESHOLDS]
+    return {
+        'keys': boards + [staging_key(board) for board in boards],
+        'args': [amount, player_id, '' if seed is None else seed] + thresholds,
+    }
+
+
+def current_score(player_id):
+    # The score the boards should show: the stored one plus, in write-behind mode, the rewards not flushed yet
+    score = Player.objects.filter(pk=player_id, is_active=True).values_list('score', flat=True).first()
+    if score is not None and settings.SCORE_WRITE_BEHIND:
+        score += score_buffer.pending(player_id)
+    return score
+
+
+def _run_record(player_id, amount, seed=None):
+    global _record_script
+    connection = get_connection()
+    if _record_script is None:
+        _record_script = connection.register_script(RECORD_SCRIPT)
+    return _record_script(client=connection, **_record_arguments(player_id, amount, seed))
+
+
+def record(player_id, amount):
+    score = _run_record(player_id, amount)
+    if score is None:
+        # Not ranked yet (a new player, or one added since the last rebuild), so they start from their whole score,
+        # which already includes this amount
+        score = current_score(player_id)
+        if score is None:
+            return None
+        _run_record(player_id, amount, seed=score)
+    return int(float(score))
+
+
+async def arecord(player_id, amount):
+    connection = get_async_redis_connection()
+    script = connection.register_script(RECORD_SCRIPT)
+    score = await script(client=connection, **_record_arguments(player_id, amount))
+    if score is None:
+        score = await sync_to_async(current_score)(player_id)
+        if score is None:
+            return None
+        await script(client=connection, **_record_arguments(player_id, amount, seed=score))
+    return int(float(score))
+
+
+def sync(player):
+    """Puts a player whose row was edited directly (in the admin, say) back on the boards with their stored score."""
+    if not player.is_active:
+        pipe = get_connection().pipeline()
+        for board in _boards():
+            pipe.zrem(board, player.pk)
+            pipe.zrem(staging_key(board), player.pk)
+        pipe.execute()
+        return None
+    score = current_score(player.pk)
+    if score is not None:
+        _run_record(player.pk, 0, seed=score)
+    return score
+
+
+def get_score(player_id):
+    score = get_connection().zscore(GLOBAL_BOARD, player_id)
+    return None if score is None else int(score)
+
+
+def get_rank(player_id, league=None):
+    rank = get_connection().zrevrank(board_key(league), player_id)
+    return None if rank is None else rank + 1
+
+
+def get_top(limit=10, league=None):
+    entries = get_connection().zrevrange(board_key(league), 0, limit - 1, withscores=True)
+    return _with_players(entries, first_rank=1)
+
+
+def get_around(player_id, radius=5, league=None):
+    connection = get_connection()
+    rank = connection.zrevrank(board_key(league), player_id)
+    if rank is None:
+        return []
+
+    start = max(rank - radius, 0)
+    entries = connection.zrevrange(board_key(league), start, rank + radius, withscores=True)
+    return _with_players(entries, first_rank=start + 1)
+
+
+def _with_players(entries, first_rank):
+    player_ids = [int(member) for member, _ in entries]
+    names = dict(Player.objects.filter(pk__in=player_ids).values_list('id', 'display_name'))
+    return [
+        {'rank': first_rank + index, 'id': player_id, 'display_name': names.get(player_id), 'score': int(score)}
+        for index, (player_id, (_, score)) in enumerate(zip(player_ids, entries))
+    ]
+
+
+def rebuild(batch_size=1000):
+    """
+    Repopulates the boards from the Player table (plus, in write-behind mode, the rewards not flushed yet).
+
+    The boards are built under staging keys and swapped in at once, so readers never see a partial leaderboard.
+    Rewards recorded meanwhile still reach the live boards, and record() adds them to the staging boards as well
+    for players already staged; players staged later are read with them included. Only a reward landing between
+    reading a batch and staging it can be missed.
+    """
+    connection = get_connection()
+    boards = _boards()
+    connection.delete(*[staging_key(board) for board in boards])
+
+    filled = set()
+    total = 0
+    last_pk = 0
+    while True:
+        batch = list(Player.objects.filter(pk__gt=last_pk, is_active=True)
+                     .order_by('pk').values_list('pk', 'score')[:batch_size])
+        if not batch:
+            break
+
+        filled.update(_stage(connection, batch))
+        total += len(batch)
+        last_pk = batch[-1][0]
+
+    pipe = connection.pipeline()
+    for board in boards:
+        if board in filled:
+            pipe.rename(staging_key(board), board)
+        else:
+            pipe.delete(board)
+    pipe.execute()
+    return total
+
+
+def _stage(connection, batch):
+    if settings.SCORE_WRITE_BEHIND:
+        pending = score_buffer.pending_many([player_id for player_id, _ in batch])
+        batch = [(player_id, score + pending[player_id]) for player_id, score in batch]
+
+    by_board = {GLOBAL_BOARD: {}}
+    for player_id, score in batch:
+        by_board[GLOBAL_BOARD][player_id] = score
+        by_board.setdefault(board_key(Player.league_for(score)), {})[player_id] = score
+
+    pipe = connection.pipeline(transaction=False)
+    for board, members in by_board.items():
+        pipe.zadd(staging_key(board), members)
+    pipe.execute()
+    return by_board.keys()
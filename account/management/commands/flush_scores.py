@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from account import score_buffer
+
+
+class Command(BaseCommand):
+    help = ('Apply the quiz rewards buffered in Redis (SCORE_WRITE_BEHIND) to the Player table. Runs as a worker '
+            'flushing every --interval seconds, or once with --once.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=score_buffer.FLUSH_BATCH_SIZE,
+                            help='Number of players updated per query.')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between flushes.')
+        parser.add_argument('--once', action='store_true', help='Flush what is buffered and exit.')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            players = score_buffer.flush(options['batch_size'])
+            if options['once']:
+                self.stdout.write(self.style.SUCCESS(f'Flushed scores of {players} players.'))
+                return
+            if players and options['verbosity'] > 1:
+                self.stdout.write(f'Flushed scores of {players} players.')
+            time.sleep(options['interval'])
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from account import leaderboard, score_buffer
+
+
+class Command(BaseCommand):
+    help = 'Repopulate the Redis leaderboards from the Player table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of players loaded per query.')
+
+    def handle(self, *args, **options):
+        if settings.SCORE_WRITE_BEHIND:
+            # Buffered rewards are already on the boards, they have to reach the table before it is read
+            score_buffer.flush()
+        total = leaderboard.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt leaderboards for {total} players.'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0004_player_league_player_score'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='player',
+            index=models.Index(fields=['-score', 'id'], name='player_score_desc_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0005_player_score_desc_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreFlush',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch_id', models.UUIDField(editable=False, unique=True, verbose_name='Batch ID')),
+                ('players', models.PositiveIntegerField(verbose_name='Players')),
+                ('total', models.BigIntegerField(verbose_name='Total Score')),
+                ('flushed_at', models.DateTimeField(auto_now_add=True, verbose_name='Flushed At')),
+            ],
+        ),
+    ]
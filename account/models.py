@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.db import models
+from django.db.models import Case, Value, When
+from django.db.models.lookups import GreaterThanOrEqual
 
 class PlayerManager(BaseUserManager):
     def create_user(self, phone, password=None, **extra_fields):
@@ -24,6 +26,13 @@ class Player(AbstractBaseUser, PermissionsMixin):
         GOLD = 'gold', 'Gold'
         MASTER = 'master', 'Master'
 
+    LEAGUE_THRESHOLDS = (
+        (6000, League.MASTER),
+        (3500, League.GOLD),
+        (2000, League.SILVER),
+        (1000, League.BRONZE),
+    )
+
     phone = models.CharField(max_length=11, unique=True, verbose_name='Phone Number')
     name = models.CharField(max_length=50, verbose_name='Full Name')
     display_name = models.CharField(max_length=50, verbose_name='Display Name')
@@ -42,18 +51,42 @@ class Player(AbstractBaseUser, PermissionsMixin):
 
     objects = PlayerManager()
 
+    class Meta:
+        indexes = [
+            # Score ranking, highest first
+            models.Index(fields=['-score', 'id'], name='player_score_desc_idx'),
+        ]
+
+    @classmethod
+    def league_for(cls, score):
+        for threshold, league in cls.LEAGUE_THRESHOLDS:
+            if score >= threshold:
+                return league
+        return cls.League.NO_LEAGUE
+
+    @classmethod
+    def league_expression(cls, score):
+        # SQL counterpart of league_for, so the league can be derived in the same UPDATE as the score
+        return Case(
+            *[When(GreaterThanOrEqual(score, threshold), then=Value(league))
+              for threshold, league in cls.LEAGUE_THRESHOLDS],
+            default=Value(cls.League.NO_LEAGUE),
+        )
+
     def save(self, *args, **kwargs):
-        if self.score < 1000:
-            self.league = self.League.NO_LEAGUE
-        elif 1000 <= self.score < 2000:
-            self.league = self.League.BRONZE
-        elif 2000 <= self.score < 3500:
-            self.league = self.League.SILVER
-        elif 3500 <= self.score < 6000:
-            self.league = self.League.GOLD
-        else:
-            self.league = self.League.MASTER
+        self.league = self.league_for(self.score)
         super().save(*args, **kwargs)
 
     def __str__(self):
         return self.display_name
+
+
+class ScoreFlush(models.Model):
+    # Ledger of buffered score batches already applied, written in the same transaction as their UPDATE
+    batch_id = models.UUIDField(unique=True, editable=False, verbose_name='Batch ID')
+    players = models.PositiveIntegerField(verbose_name='Players')
+    total = models.BigIntegerField(verbose_name='Total Score')
+    flushed_at = models.DateTimeField(auto_now_add=True, verbose_name='Flushed At')
+
+    def __str__(self):
+        return str(self.batch_id)
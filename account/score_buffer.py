@@ -0,0 +1,137 @@
+import logging
+import uuid
+
+from django.db import DatabaseError, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Now
+from django_redis import get_redis_connection
+
+from QuizAPP.async_redis import get_async_redis_connection
+from .models import Player, ScoreFlush
+
+logger = logging.getLogger(__name__)
+
+# Rewards are added to a hash of player id -> pending delta. A flush renames the hash to a batch key, applies
+# it in one UPDATE and records the batch in the ScoreFlush ledger in the same transaction.
+PENDING_KEY = 'scores:pending'
+BATCHES_KEY = 'scores:batches'
+BATCH_PREFIX = 'scores:batch:'
+FLUSH_BATCH_SIZE = 1000
+
+# Moves the pending hash to a new batch, registering the batch in the same step so it is never lost.
+CLAIM_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('RENAME', KEYS[1], KEYS[2])
+redis.call('SADD', KEYS[3], ARGV[1])
+return 1
+"""
+
+# Sums a player's pending delta over the hash and the batches not cleaned up yet.
+PENDING_SCRIPT = """
+local total = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or 0)
+for _, batch in ipairs(redis.call('SMEMBERS', KEYS[2])) do
+    total = total + tonumber(redis.call('HGET', ARGV[2] .. batch, ARGV[1]) or 0)
+end
+return total
+"""
+
+_claim_script = None
+_pending_script = None
+
+
+def get_connection():
+    return get_redis_connection('default')
+
+
+def batch_key(batch_id):
+    return f'{BATCH_PREFIX}{batch_id}'
+
+
+def add(player_id, amount):
+    get_connection().hincrby(PENDING_KEY, player_id, amount)
+
+
+async def aadd(player_id, amount):
+    await get_async_redis_connection().hincrby(PENDING_KEY, player_id, amount)
+
+
+def pending(player_id):
+    global _pending_script
+    connection = get_connection()
+    if _pending_script is None:
+        _pending_script = connection.register_script(PENDING_SCRIPT)
+    return int(_pending_script(keys=[PENDING_KEY, BATCHES_KEY], args=[player_id, BATCH_PREFIX], client=connection))
+
+
+def pending_many(player_ids):
+    global _pending_script
+    connection = get_connection()
+    if _pending_script is None:
+        _pending_script = connection.register_script(PENDING_SCRIPT)
+    pipe = connection.pipeline(transaction=False)
+    for player_id in player_ids:
+        _pending_script(keys=[PENDING_KEY, BATCHES_KEY], args=[player_id, BATCH_PREFIX], client=pipe)
+    return {player_id: int(total) for player_id, total in zip(player_ids, pipe.execute())}
+
+
+def claim():
+    global _claim_script
+    connection = get_connection()
+    if _claim_script is None:
+        _claim_script = connection.register_script(CLAIM_SCRIPT)
+    batch_id = str(uuid.uuid4())
+    if _claim_script(keys=[PENDING_KEY, batch_key(batch_id), BATCHES_KEY], args=[batch_id], client=connection):
+        return batch_id
+    return None
+
+
+def read_batch(batch_id):
+    deltas = {}
+    for player_id, delta in get_connection().hgetall(batch_key(batch_id)).items():
+        try:
+            player_id, delta = int(player_id), int(delta)
+        except ValueError:
+            # Anything unparsable would fail the batch on every flush, so it is dropped
+            logger.warning('Skipping invalid buffered score %r=%r in batch %s', player_id, delta, batch_id)
+            continue
+        if delta:
+            deltas[player_id] = delta
+    return deltas
+
+
+def apply(batch_id, batch_size=FLUSH_BATCH_SIZE):
+    deltas = read_batch(batch_id)
+
+    with transaction.atomic():
+        # A batch whose transaction committed before a crash is already in the ledger and is only cleaned up
+        _, created = ScoreFlush.objects.get_or_create(
+            batch_id=batch_id, defaults={'players': len(deltas), 'total': sum(deltas.values())})
+        if created:
+            player_ids = sorted(deltas)
+            for start in range(0, len(player_ids), batch_size):
+                chunk = player_ids[start:start + batch_size]
+                score = F('score') + Case(*[When(pk=player_id, then=Value(deltas[player_id])) for player_id in chunk],
+                                          default=Value(0), output_field=IntegerField())
+                Player.objects.filter(pk__in=chunk).update(score=score, league=Player.league_expression(score),
+                                                           updated_at=Now())
+
+    pipe = get_connection().pipeline()
+    pipe.delete(batch_key(batch_id))
+    pipe.srem(BATCHES_KEY, batch_id)
+    pipe.execute()
+    return len(deltas)
+
+
+def flush(batch_size=FLUSH_BATCH_SIZE):
+    """Applies the buffered rewards, starting with batches an interrupted flush left behind."""
+    claim()
+    players = 0
+    for batch_id in get_connection().smembers(BATCHES_KEY):
+        try:
+            players += apply(batch_id.decode(), batch_size)
+        except DatabaseError:
+            # The batch stays in Redis and is retried by the next flush
+            logger.exception('Flushing score batch %s failed', batch_id.decode())
+    return players
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.db.models import F
+from django.db.models.functions import Now
+
+from .models import Player
+from . import leaderboard, score_buffer
+
+
+def _score_update(amount):
+    score = F('score') + amount
+    return {'score': score, 'league': Player.league_expression(score), 'updated_at': Now()}
+
+
+def credit_score(player_id, amount):
+    # In write-behind mode nothing checks the row, a reward for a deleted player is dropped when flushed
+    if settings.SCORE_WRITE_BEHIND:
+        score_buffer.add(player_id, amount)
+    elif not Player.objects.filter(pk=player_id).update(**_score_update(amount)):
+        raise Player.DoesNotExist('Player not found.')
+
+    leaderboard.record(player_id, amount)
+
+
+async def acredit_score(player_id, amount):
+    if settings.SCORE_WRITE_BEHIND:
+        await score_buffer.aadd(player_id, amount)
+    elif not await Player.objects.filter(pk=player_id).aupdate(**_score_update(amount)):
+        raise Player.DoesNotExist('Player not found.')
+
+    await leaderboard.arecord(player_id, amount)
@@ -1,3 +1,348 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.admin.sites import site
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from QuizAPP import throttling
+from quiz import caches
+from quiz.models import Quiz
+from .models import Player, ScoreFlush
+from .services import credit_score
+from .tokens import issue_tokens, read_access_token
+from .admin import PlayerAdmin
+from . import leaderboard, score_buffer
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN output is PostgreSQL specific.')
+class QueryPlanTests(TestCase):
+    """
+    Checks that score ranking is answered by player_score_desc_idx. Sequential scans are disabled for the test
+    transaction because the seeded table is small enough for PostgreSQL to prefer them otherwise.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Player.objects.bulk_create([
+            Player(phone=f'0912{index:07d}', name='Player', display_name=f'player{index}', score=index * 10)
+            for index in range(200)
+        ])
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def test_ranking(self):
+        plan = Player.objects.order_by('-score', 'id')[:10].explain()
+        self.assertRegex(plan, r'Index (Only )?Scan (using|on) player_score_desc_idx\b')
+
+
+class ConditionalProfileTests(APITestCase):
+    def setUp(self):
+        self.player = Player.objects.create_user('09120000000', 'password', name='Player', display_name='player')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_tokens(self.player)["access"]}')
+        self.url = reverse('account:player-detail', args=[self.player.pk])
+
+    def test_revalidation(self):
+        response = self.client.get(self.url)
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.url, headers={'If-Modified-Since': response['Last-Modified']})
+        self.assertEqual(response.status_code, 304)
+
+        self.player.display_name = 'renamed'
+        self.player.save()
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': etag}).status_code, 200)
+
+
+class TokenRefreshTests(APITestCase):
+    def setUp(self):
+        self.player = Player.objects.create_user('09120000000', 'password', name='Player', display_name='player')
+
+    def refresh(self, token):
+        return self.client.post(reverse('account:token-refresh'), {'refresh': token}, format='json')
+
+    def test_refresh_reloads_the_player(self):
+        token = issue_tokens(self.player)['refresh']
+        Player.objects.filter(pk=self.player.pk).update(is_staff=True)
+        response = self.refresh(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(read_access_token(response.data['access'])['staff'])
+
+    def test_password_change_revokes_refresh_tokens(self):
+        token = issue_tokens(self.player)['refresh']
+        self.player.set_password('new password')
+        self.player.save()
+        self.assertEqual(self.refresh(token).status_code, 401)
+        self.assertEqual(self.refresh(issue_tokens(self.player)['refresh']).status_code, 200)
+
+    def test_malformed_refresh_token(self):
+        for token in (None, 123, ['a'], {'id': self.player.pk}):
+            self.assertEqual(self.refresh(token).status_code, 400)
+        self.assertEqual(self.refresh('invalid').status_code, 401)
+        self.assertEqual(self.refresh(issue_tokens(self.player)['access']).status_code, 401)
+        response = self.client.post(reverse('account:token-refresh'), [1], format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class TokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        self.player = Player.objects.create_user('09120000000', 'password', name='Player', display_name='player')
+        self.url = reverse('account:player-detail', args=[self.player.pk])
+
+    def get(self, authorization):
+        return self.client.get(self.url, HTTP_AUTHORIZATION=authorization)
+
+    def test_access_token(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(f'Bearer {issue_tokens(self.player)["access"]}').status_code, 200)
+
+    def test_malformed_header(self):
+        access = issue_tokens(self.player)['access']
+        for authorization in ('Bearer', f'Bearer {access} extra', 'Bearer invalid', 'Bearer \xff'):
+            with self.subTest(authorization):
+                response = self.get(authorization)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+
+    def test_expired_access_token(self):
+        access = issue_tokens(self.player)['access']
+        with override_settings(ACCESS_TOKEN_LIFETIME=timedelta(seconds=-1)):
+            response = self.get(f'Bearer {access}')
+        self.assertEqual((response.status_code, str(response.data['detail'])), (401, 'Token expired.'))
+
+    def test_refresh_token_is_not_an_access_token(self):
+        response = self.get(f'Bearer {issue_tokens(self.player)["refresh"]}')
+        self.assertEqual((response.status_code, str(response.data['detail'])), (401, 'Invalid token.'))
+
+
+@override_settings(SCORE_WRITE_BEHIND=True)
+class ScoreWriteBehindTests(APITestCase):
+    def setUp(self):
+        connection = score_buffer.get_connection()
+        connection.delete(score_buffer.PENDING_KEY, score_buffer.BATCHES_KEY)
+        self.player = Player.objects.create_user('09120000000', 'password', name='Player', display_name='player',
+                                                 score=900)
+        self.other = Player.objects.create_user('09120000001', 'password', name='Other', display_name='other')
+        leaderboard.rebuild()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_tokens(self.player)["access"]}')
+        self.url = reverse('account:player-detail', args=[self.player.pk])
+
+    def test_profile_includes_pending_rewards(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            credit_score(self.player.pk, 150)
+
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['score'], response.data['league']), (1050, Player.League.BRONZE))
+        self.assertNotIn('Last-Modified', response)
+        self.assertEqual(Player.objects.get(pk=self.player.pk).score, 900)
+
+    def test_flush(self):
+        credit_score(self.player.pk, 150)
+        credit_score(self.other.pk, 20)
+        credit_score(self.player.pk, 50)
+
+        self.assertEqual(score_buffer.flush(), 2)
+        self.assertEqual(dict(Player.objects.values_list('display_name', 'score')), {'player': 1100, 'other': 20})
+        self.assertEqual(Player.objects.get(pk=self.player.pk).league, Player.League.BRONZE)
+        self.assertEqual(score_buffer.pending(self.player.pk), 0)
+        self.assertEqual(score_buffer.flush(), 0)
+
+    def test_invalid_entries_do_not_block_flushing(self):
+        credit_score(self.player.pk, 150)
+        score_buffer.get_connection().hincrby(score_buffer.PENDING_KEY, 'abc', 10)
+        with self.assertLogs('account.score_buffer', 'WARNING'):
+            self.assertEqual(score_buffer.flush(), 1)
+        self.assertEqual(Player.objects.get(pk=self.player.pk).score, 1050)
+        self.assertFalse(score_buffer.get_connection().smembers(score_buffer.BATCHES_KEY))
+
+    def test_flush_is_idempotent(self):
+        credit_score(self.player.pk, 150)
+        batch_id = score_buffer.claim()
+        score_buffer.apply(batch_id)
+        # A flush that crashed after committing left its batch in Redis
+        connection = score_buffer.get_connection()
+        connection.hset(score_buffer.batch_key(batch_id), self.player.pk, 150)
+        connection.sadd(score_buffer.BATCHES_KEY, batch_id)
+        self.assertEqual(score_buffer.pending(self.player.pk), 150)
+
+        score_buffer.flush()
+        self.assertEqual(Player.objects.get(pk=self.player.pk).score, 1050)
+        self.assertEqual(ScoreFlush.objects.count(), 1)
+        self.assertEqual(score_buffer.pending(self.player.pk), 0)
+
+    def test_rebuild_includes_pending_rewards(self):
+        credit_score(self.player.pk, 150)
+        leaderboard.get_connection().delete(leaderboard.GLOBAL_BOARD)
+        leaderboard.rebuild()
+        self.assertEqual(leaderboard.get_score(self.player.pk), 1050)
+        self.assertEqual(leaderboard.get_rank(self.player.pk, Player.League.BRONZE), 1)
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        self.players = [
+            Player.objects.create_user(f'0912000000{index}', 'password', name=f'Player {index}',
+                                       display_name=f'player{index}', score=score)
+            for index, score in enumerate([100, 900, 1500, 2500, 4000, 7000])
+        ]
+        leaderboard.rebuild()
+
+    def boards(self, player):
+        connection = leaderboard.get_connection()
+        return [league for league in Player.League.values
+                if connection.zscore(leaderboard.board_key(league), player.pk) is not None]
+
+    def test_rewards_move_players_between_leagues(self):
+        player = self.players[1]
+        self.assertEqual(self.boards(player), [Player.League.NO_LEAGUE])
+        credit_score(player.pk, 150)
+        self.assertEqual(self.boards(player), [Player.League.BRONZE])
+        self.assertEqual(leaderboard.get_rank(player.pk, Player.League.BRONZE), 2)
+        credit_score(player.pk, 5000)
+        self.assertEqual(self.boards(player), [Player.League.MASTER])
+        self.assertEqual((leaderboard.get_score(player.pk), leaderboard.get_rank(player.pk)), (6050, 2))
+
+    def test_unranked_player_starts_from_stored_score(self):
+        player = Player.objects.create_user('09120000010', 'password', name='New', display_name='new', score=1900)
+        credit_score(player.pk, 200)
+        self.assertEqual(leaderboard.get_score(player.pk), 2100)
+        self.assertEqual(self.boards(player), [Player.League.SILVER])
+
+    def test_around(self):
+        around = leaderboard.get_around(self.players[3].pk, radius=1)
+        self.assertEqual([(entry['rank'], entry['display_name'], entry['score']) for entry in around],
+                         [(2, 'player4', 4000), (3, 'player3', 2500), (4, 'player2', 1500)])
+        self.assertEqual([entry['rank'] for entry in leaderboard.get_around(self.players[5].pk, radius=2)], [1, 2, 3])
+        self.assertEqual(leaderboard.get_around(self.players[0].pk, league=Player.League.GOLD), [])
+
+    def test_rebuild_matches_the_table(self):
+        connection = leaderboard.get_connection()
+        connection.zadd(leaderboard.GLOBAL_BOARD, {self.players[0].pk: 5000})
+        connection.zadd(leaderboard.board_key(Player.League.MASTER), {'999999': 1})
+        Player.objects.filter(pk=self.players[5].pk).update(is_active=False)
+
+        self.assertEqual(leaderboard.rebuild(), 5)
+        self.assertEqual(leaderboard.get_score(self.players[0].pk), 100)
+        self.assertIsNone(leaderboard.get_rank(self.players[5].pk))
+        self.assertFalse(connection.exists(leaderboard.board_key(Player.League.MASTER)))
+        self.assertEqual(dict((entry['id'], entry['score']) for entry in leaderboard.get_top(10)),
+                         {player.pk: player.score for player in self.players[:5]})
+
+    def test_rewards_during_rebuild_are_kept(self):
+        stage = leaderboard._stage
+
+        def stage_and_credit(connection, batch):
+            staged = stage(connection, batch)
+            if batch[0][0] == self.players[0].pk:
+                # One player already staged and one not read yet
+                credit_score(self.players[0].pk, 1000)
+                credit_score(self.players[5].pk, 50)
+            return staged
+
+        with mock.patch.object(leaderboard, '_stage', stage_and_credit):
+            leaderboard.rebuild(batch_size=3)
+
+        self.assertEqual(leaderboard.get_score(self.players[0].pk), 1100)
+        self.assertEqual(self.boards(self.players[0]), [Player.League.BRONZE])
+        self.assertEqual(leaderboard.get_score(self.players[5].pk), 7050)
+
+    def test_admin_edits_reach_the_boards(self):
+        admin = PlayerAdmin(Player, site)
+        request = RequestFactory().post('/')
+        player = self.players[2]
+        player.score = 3600
+        admin.save_model(request, player, mock.Mock(changed_data=['score']), True)
+        self.assertEqual((leaderboard.get_score(player.pk), self.boards(player)), (3600, [Player.League.GOLD]))
+
+        player.is_active = False
+        admin.save_model(request, player, mock.Mock(changed_data=['is_active']), True)
+        self.assertIsNone(leaderboard.get_score(player.pk))
+        self.assertEqual(self.boards(player), [])
+
+
+class DisplayNameTests(APITestCase):
+    def setUp(self):
+        self.player = Player.objects.create_user('09120000000', 'password', name='Player', display_name='player')
+        self.quiz = Quiz.objects.create(author=self.player, title='Quiz', description='Description',
+                                        available_time=timedelta(minutes=5), verified=True)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_tokens(self.player)["access"]}')
+
+    def bundle_author(self):
+        return json.loads(caches.get_bundle(self.quiz.pk))['author']['display_name']
+
+    def test_rename_refreshes_bundles(self):
+        self.assertEqual(self.bundle_author(), 'player')
+        version = caches.get_catalogue_version()
+        response = self.client.patch(reverse('account:player-update', args=[self.player.pk]),
+                                     {'display_name': 'renamed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.bundle_author(), 'renamed')
+        self.assertNotEqual(caches.get_catalogue_version(), version)
+
+    def test_admin_rename_refreshes_bundles(self):
+        self.assertEqual(self.bundle_author(), 'player')
+        self.player.display_name = 'renamed'
+        PlayerAdmin(Player, site).save_model(RequestFactory().post('/'), self.player,
+                                             mock.Mock(changed_data=['display_name']), True)
+        self.assertEqual(self.bundle_author(), 'renamed')
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'login': '2/min'}})
+class LoginThrottleTests(APITestCase):
+    def setUp(self):
+        throttling.get_redis_connection('default').delete(
+            *[throttling.bucket_key('login', f'ip:{address}') for address in ('127.0.0.1', '10.0.0.1', '10.0.0.2')])
+        Player.objects.create_user('09120000000', 'password', name='Player', display_name='player')
+
+    def login(self, **extra):
+        return self.client.post(reverse('account:login'), {'phone': '09120000000', 'password': 'password'},
+                                format='json', **extra)
+
+    def test_bucket_empties(self):
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response['X-RateLimit-Limit'], response['X-RateLimit-Remaining']), ('2', '1'))
+        self.assertEqual(self.login()['X-RateLimit-Remaining'], '0')
+
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertLessEqual(int(response['Retry-After']), 30)
+
+    def test_forwarded_for_is_ignored_without_proxies(self):
+        for address in ('10.0.0.1', '10.0.0.2'):
+            self.assertEqual(self.login(HTTP_X_FORWARDED_FOR=address).status_code, 200)
+        self.assertEqual(self.login(HTTP_X_FORWARDED_FOR='10.0.0.3').status_code, 429)
+
+    def test_forwarded_for_behind_a_proxy(self):
+        with self.settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            for _ in range(2):
+                self.assertEqual(self.login(HTTP_X_FORWARDED_FOR='10.0.0.1').status_code, 200)
+            self.assertEqual(self.login(HTTP_X_FORWARDED_FOR='10.0.0.1').status_code, 429)
+            self.assertEqual(self.login(HTTP_X_FORWARDED_FOR='10.0.0.2').status_code, 200)
+
+    async def test_async_buckets_are_shared(self):
+        ident = 'ip:10.0.0.1'
+        self.assertTrue(throttling.consume('login', ident, 2, 1 / 30).allowed)
+        bucket = await throttling.aconsume('login', ident, 2, 1 / 30)
+        self.assertTrue(bucket.allowed)
+        self.assertLess(bucket.remaining, 1)
+        bucket = await throttling.aconsume('login', ident, 2, 1 / 30)
+        self.assertFalse(bucket.allowed)
+        self.assertAlmostEqual(bucket.wait, 30, delta=1)
+
+    @override_settings(THROTTLE_ENABLED=False)
+    def test_disabled(self):
+        for _ in range(3):
+            self.assertNotIn('X-RateLimit-Limit', self.login())
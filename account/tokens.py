@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core import signing
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+ACCESS_TOKEN_SALT = 'account.tokens.access'
+REFRESH_TOKEN_SALT = 'account.tokens.refresh'
+
+
+def issue_tokens(player):
+    claims = {'id': player.pk, 'staff': player.is_staff, 'superuser': player.is_superuser}
+    refresh_claims = {'id': player.pk, 'password': password_fingerprint(player)}
+    return {
+        'access': signing.dumps(claims, salt=ACCESS_TOKEN_SALT),
+        'refresh': signing.dumps(refresh_claims, salt=REFRESH_TOKEN_SALT),
+        'expires_in': int(settings.ACCESS_TOKEN_LIFETIME.total_seconds()),
+    }
+
+
+def read_access_token(token):
+    return signing.loads(token, salt=ACCESS_TOKEN_SALT, max_age=settings.ACCESS_TOKEN_LIFETIME)
+
+
+def read_refresh_token(token):
+    return signing.loads(token, salt=REFRESH_TOKEN_SALT, max_age=settings.REFRESH_TOKEN_LIFETIME)
+
+
+def password_fingerprint(player):
+    # Changes with the password hash, so changing the password revokes every refresh token issued before
+    return salted_hmac(REFRESH_TOKEN_SALT, player.password).hexdigest()[:16]
+
+
+def refresh_token_matches(player, claims):
+    return constant_time_compare(claims.get('password', ''), password_fingerprint(player))
@@ -5,7 +5,10 @@ app_name = 'account'
 
 urlpatterns = [
     path('login/', views.LoginView.as_view(), name='login'),
+    path('token/refresh/', views.TokenRefreshView.as_view(), name='token-refresh'),
     path('register/', views.RegisterView.as_view(), name='register'),
     path('profile/<int:pk>/', views.PlayerRetrieveView.as_view(), name='player-detail'),
     path('profile/<int:pk>/update/', views.PlayerUpdateView.as_view(), name='player-update'),
+    path('leaderboard/', views.LeaderboardView.as_view(), name='leaderboard'),
+    path('leaderboard/<int:pk>/', views.LeaderboardPlayerView.as_view(), name='leaderboard-player'),
 ]
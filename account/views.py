@@ -1,52 +1,143 @@
+from django.conf import settings
+from django.core import signing
 from django.shortcuts import render
-from rest_framework.authentication import BasicAuthentication
 
 from .models import Player
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.generics import CreateAPIView, RetrieveAPIView, UpdateAPIView
 from .serializers import LoginSerializer, PlayerSerializer, RegisterSerializer
 from .permissions import IsAccountOwnerOrAdmin
+from .authentication import TokenAuthentication
+from .tokens import issue_tokens, read_refresh_token, refresh_token_matches
+from . import leaderboard, score_buffer
+from QuizAPP.conditional import make_etag, not_modified, set_validators
+from QuizAPP.throttling import IPTokenBucketThrottle
+from quiz.caches import invalidate_author
 
 
 class LoginView(APIView):
+    # Every attempt costs a password hash
+    throttle_classes = [IPTokenBucketThrottle]
+    throttle_scope = 'login'
+
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
         try:
             serializer.is_valid(raise_exception=True)
             player = serializer.validated_data['user']
             player_data = PlayerSerializer(player).data
+            player_data.update(issue_tokens(player))
             return Response(player_data)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
+class TokenRefreshView(APIView):
+    def post(self, request):
+        token = request.data.get('refresh') if isinstance(request.data, dict) else None
+        if not isinstance(token, str):
+            return Response({'error': 'refresh is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            claims = read_refresh_token(token)
+        except signing.BadSignature:
+            return Response({'error': 'Invalid or expired refresh token.'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        player = Player.objects.filter(pk=claims['id'], is_active=True).first()
+        if player is None:
+            return Response({'error': 'Player not found.'}, status=status.HTTP_401_UNAUTHORIZED)
+        if not refresh_token_matches(player, claims):
+            return Response({'error': 'Invalid or expired refresh token.'}, status=status.HTTP_401_UNAUTHORIZED)
+        return Response(issue_tokens(player))
+
+
 class RegisterView(CreateAPIView):
     serializer_class = RegisterSerializer
     queryset = Player.objects.all()
+    throttle_classes = [IPTokenBucketThrottle]
+    throttle_scope = 'register'
 
 
 class PlayerRetrieveView(RetrieveAPIView):
     queryset = Player.objects.all()
     serializer_class = PlayerSerializer
     permission_classes = [IsAccountOwnerOrAdmin]
-    authentication_classes = [BasicAuthentication]
+    authentication_classes = [TokenAuthentication]
+
+    def retrieve(self, request, *args, **kwargs):
+        player = self.get_object()
+        pending = score_buffer.pending(player.pk) if settings.SCORE_WRITE_BEHIND else 0
+        # Buffered rewards change the score without touching updated_at, so only the ETag can validate them
+        last_modified = None if pending else player.updated_at
+        etag = make_etag('player', player.pk, player.updated_at.isoformat(), pending)
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            if pending:
+                player.score += pending
+                player.league = Player.league_for(player.score)
+            response = set_validators(Response(self.get_serializer(player).data), etag, last_modified)
+        return response
 
 
 class PlayerUpdateView(UpdateAPIView):
     queryset = Player.objects.all()
     serializer_class = PlayerSerializer
     permission_classes = [IsAccountOwnerOrAdmin]
-    authentication_classes = [BasicAuthentication]
+    authentication_classes = [TokenAuthentication]
 
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', True)
         instance = self.get_object()
+        display_name = instance.display_name
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         if serializer.is_valid():
             serializer.validated_data.pop('password', None)
             self.perform_update(serializer)
+            if instance.display_name != display_name:
+                invalidate_author(instance.pk)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+
+
+def _bounded_int(value, default, maximum):
+    try:
+        return max(1, min(int(value), maximum))
+    except (TypeError, ValueError):
+        return default
+
+
+class LeaderboardView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        league = request.query_params.get('league')
+        if league and league not in Player.League.values:
+            return Response({'error': 'Invalid league.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        limit = _bounded_int(request.query_params.get('limit'), default=10, maximum=100)
+        return Response({'league': league, 'results': leaderboard.get_top(limit, league)})
+
+
+class LeaderboardPlayerView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        score = leaderboard.get_score(pk)
+        if score is None:
+            return Response({'error': 'Player is not ranked yet.'}, status=status.HTTP_404_NOT_FOUND)
+
+        league = Player.league_for(score)
+        radius = _bounded_int(request.query_params.get('radius'), default=5, maximum=50)
+        around_league = league if request.query_params.get('scope') == 'league' else None
+        return Response({
+            'id': pk,
+            'score': score,
+            'league': league,
+            'rank': leaderboard.get_rank(pk),
+            'league_rank': leaderboard.get_rank(pk, league),
+            'around': leaderboard.get_around(pk, radius, around_league),
+        })
@@ -0,0 +1,23 @@
+"""
+Load tests for the gameplay API. gameplay_throughput drives running servers over HTTP, in_process drives the
+WSGI and ASGI handlers inside a Django process. Both play the same routes as the same kind of players.
+"""
+
+PASSWORD = 'Benchmark-Passw0rd'
+
+ROUTES = {
+    'wsgi': {
+        'start_quiz': '/api/quiz/start_quiz/',
+        'questions': '/api/quiz/{quiz}/bundle/',
+        'finish_quiz': '/api/quiz/finish_quiz/',
+    },
+    'asgi': {
+        'start_quiz': '/api/quiz/async/start_quiz/',
+        'questions': '/api/quiz/async/{quiz}/bundle/',
+        'finish_quiz': '/api/quiz/async/finish_quiz/',
+    },
+}
+
+
+def phone_number(number):
+    return f'09{number:09d}'
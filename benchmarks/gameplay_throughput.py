@@ -0,0 +1,128 @@
+"""
+Plays the start -> bundle -> finish loop against a WSGI and an ASGI deployment of the project
+and reports the throughput and latency of each.
+
+    export THROTTLE_ENABLED=false
+    gunicorn QuizAPP.wsgi:application -w 4 -b 127.0.0.1:8000
+    gunicorn QuizAPP.asgi:application -w 4 -k uvicorn.workers.UvicornWorker -b 127.0.0.1:8001
+    python -m benchmarks.gameplay_throughput --quiz 1 \
+        --wsgi-url http://127.0.0.1:8000 --asgi-url http://127.0.0.1:8001
+
+Run both servers on the same machine with the same worker count so the numbers are comparable.
+Every player registers and logs in from this machine and then plays far above the per-player game
+limits, so start the servers with throttling turned off; the script stops at the first 429 otherwise.
+The WSGI server is driven through the DRF views and the ASGI server through the async views.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+from benchmarks import PASSWORD, ROUTES, phone_number
+
+
+class Throttled(Exception):
+    pass
+
+
+def check(response):
+    if response.status_code == 429:
+        raise Throttled(f'{response.request.url} was throttled, start the server with THROTTLE_ENABLED=false')
+    response.raise_for_status()
+
+
+async def login(client, number):
+    phone = phone_number(number)
+    await client.post('/api/account/register/', json={
+        'phone': phone, 'name': f'bench{number}', 'display_name': f'bench{number}', 'password': PASSWORD,
+    })
+    response = await client.post('/api/account/login/', json={'phone': phone, 'password': PASSWORD})
+    check(response)
+    data = response.json()
+    return data['id'], data['access']
+
+
+async def play(client, routes, quiz, player_id, token, deadline, latencies, errors):
+    headers = {'Authorization': f'Bearer {token}'}
+    game = {'player_id': player_id, 'quiz_id': quiz}
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.post(routes['start_quiz'], json=game, headers=headers)
+            check(response)
+            response = await client.get(routes['questions'].format(quiz=quiz), headers=headers)
+            check(response)
+            answers = {question['id']: 'a' for question in response.json()['questions']}
+            response = await client.post(routes['finish_quiz'], json={**game, 'answers': answers}, headers=headers)
+            check(response)
+        except httpx.HTTPError:
+            errors.append(1)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+async def run(name, base_url, options):
+    limits = httpx.Limits(max_connections=options.concurrency, max_keepalive_connections=options.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        players = await asyncio.gather(*(login(client, options.first_player + number)
+                                         for number in range(options.concurrency)))
+
+        latencies, errors = [], []
+        started = time.perf_counter()
+        deadline = started + options.duration
+        await asyncio.gather(*(play(client, ROUTES[name], options.quiz, player_id, token, deadline, latencies, errors)
+                               for player_id, token in players))
+        elapsed = time.perf_counter() - started
+
+    return {
+        'server': name,
+        'url': base_url,
+        'concurrency': options.concurrency,
+        'games': len(latencies),
+        'errors': len(errors),
+        # Every game is three requests.
+        'requests_per_second': round(len(latencies) * 3 / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 1) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 1) if latencies else None,
+    }
+
+
+async def main(options):
+    results = []
+    for name, url in (('wsgi', options.wsgi_url), ('asgi', options.asgi_url)):
+        if url:
+            results.append(await run(name, url, options))
+
+    if options.json:
+        print(json.dumps(results, indent=2))
+        return
+    for result in results:
+        print(f"{result['server']}: {result['requests_per_second']} req/s, {result['games']} games, "
+              f"{result['errors']} errors, p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quiz', type=int, required=True, help='Id of a verified quiz to play.')
+    parser.add_argument('--wsgi-url')
+    parser.add_argument('--asgi-url')
+    parser.add_argument('--concurrency', type=int, default=100, help='Players playing at the same time.')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to play against each server.')
+    parser.add_argument('--first-player', type=int, default=900000000,
+                        help='Benchmark players get consecutive phone numbers starting here.')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except Throttled as error:
+        parser.exit(1, f'{error}\n')
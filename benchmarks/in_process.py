@@ -0,0 +1,214 @@
+import asyncio
+import math
+import platform
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import close_old_connections, connection, connections, transaction
+from django.test import AsyncClient, Client, override_settings
+
+from QuizAPP import metrics
+from account.models import Player
+from quiz.models import Quiz, Question
+from . import PASSWORD, ROUTES, phone_number
+
+PLAYER_NAME = 'Benchmark Player'
+QUIZ_TITLE = 'Benchmark Quiz'
+
+# Seeded players get consecutive phone numbers from here, players registered while benchmarking get
+# random ones above REGISTER_PHONE_START so the two never collide.
+SEED_PHONE_START = 100000000
+REGISTER_PHONE_START = 500000000
+
+ENDPOINTS = ('register', 'login', 'list_quizzes', 'start_quiz', 'questions', 'finish_quiz')
+
+
+def seed(players, quizzes, questions, batch_size=1000):
+    password = make_password(PASSWORD)
+    first = SEED_PHONE_START + Player.objects.filter(name=PLAYER_NAME).count()
+
+    with transaction.atomic():
+        Player.objects.bulk_create([
+            Player(phone=phone_number(first + index), name=PLAYER_NAME, display_name=f'bench{first + index}',
+                   password=password)
+            for index in range(players)
+        ], batch_size=batch_size)
+
+        author = Player.objects.filter(name=PLAYER_NAME).order_by('pk').first()
+        created = Quiz.objects.bulk_create([
+            Quiz(author=author, title=f'{QUIZ_TITLE} {index}', description='Generated for benchmarking.',
+                 available_time=timedelta(minutes=10), verified=True, score=100)
+            for index in range(quizzes if author else 0)
+        ], batch_size=batch_size)
+
+        Question.objects.bulk_create([
+            Question(quiz=quiz, question=f'Question {index}', option_a='A', option_b='B', option_c='C',
+                     option_d='D', correct_answer='a')
+            for quiz in created
+            for index in range(questions)
+        ], batch_size=batch_size)
+
+    return len(created)
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {endpoint: [] for endpoint in ENDPOINTS}
+        self.queries = {endpoint: [] for endpoint in ENDPOINTS}
+        self.errors = {endpoint: 0 for endpoint in ENDPOINTS}
+
+    def add(self, endpoint, elapsed, queries, ok):
+        self.samples[endpoint].append(elapsed)
+        self.queries[endpoint].append(queries)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def report(self, wall_time):
+        endpoints = {}
+        for endpoint in ENDPOINTS:
+            samples = sorted(self.samples[endpoint])
+            endpoints[endpoint] = {
+                'requests': len(samples),
+                'errors': self.errors[endpoint],
+                'throughput_rps': round(len(samples) / wall_time, 2) if wall_time else None,
+                'mean_ms': milliseconds(statistics.fmean(samples)) if samples else None,
+                'p50_ms': milliseconds(percentile(samples, 50)),
+                'p95_ms': milliseconds(percentile(samples, 95)),
+                'p99_ms': milliseconds(percentile(samples, 99)),
+                'max_ms': milliseconds(samples[-1]) if samples else None,
+                'queries_per_request': round(statistics.fmean(self.queries[endpoint]), 2) if samples else None,
+            }
+        total = sum(len(samples) for samples in self.samples.values())
+        return {
+            'wall_time_s': round(wall_time, 3),
+            'requests': total,
+            'errors': sum(self.errors.values()),
+            'throughput_rps': round(total / wall_time, 2) if wall_time else None,
+            'endpoints': endpoints,
+        }
+
+
+def percentile(samples, rank):
+    # Nearest-rank percentile over already sorted samples.
+    if not samples:
+        return None
+    return samples[max(math.ceil(rank / 100 * len(samples)) - 1, 0)]
+
+
+def milliseconds(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+class Scenario:
+    """Plays register, login, list quizzes, start, fetch questions and finish for one virtual user."""
+
+    def __init__(self, mode, player, quizzes, recorder, register_phones):
+        self.routes = ROUTES[mode]
+        self.player = player
+        self.quizzes = quizzes
+        self.recorder = recorder
+        self.register_phones = register_phones
+        self.headers = {}
+        self.answers = {}
+
+    def steps(self, iteration):
+        quiz = self.quizzes[(self.player.pk + iteration) % len(self.quizzes)]
+        game = {'player_id': self.player.pk, 'quiz_id': quiz}
+        number = next(self.register_phones)
+        yield 'register', 'post', '/api/account/register/', {
+            'phone': phone_number(number), 'name': 'Registered', 'display_name': f'reg{number}', 'password': PASSWORD,
+        }
+        yield 'login', 'post', '/api/account/login/', {'phone': self.player.phone, 'password': PASSWORD}
+        yield 'list_quizzes', 'get', '/api/quiz/', None
+        yield 'start_quiz', 'post', self.routes['start_quiz'], game
+        yield 'questions', 'get', self.routes['questions'].format(quiz=quiz), None
+        yield 'finish_quiz', 'post', self.routes['finish_quiz'], {**game, 'answers': self.answers}
+
+    def handle(self, endpoint, response):
+        if endpoint == 'login' and response.status_code == 200:
+            self.headers = {'Authorization': f'Bearer {response.json()["access"]}'}
+        if endpoint == 'questions':
+            questions = response.json().get('questions', []) if response.status_code == 200 else []
+            self.answers = {question['id']: 'a' for question in questions}
+
+    def request(self, client, method, path, data):
+        kwargs = {'headers': self.headers}
+        if data is not None:
+            kwargs.update(data=data, content_type='application/json')
+        return getattr(client, method)(path, **kwargs)
+
+    def run(self, iterations):
+        client = Client()
+        try:
+            for iteration in range(iterations):
+                for endpoint, method, path, data in self.steps(iteration):
+                    with metrics.collect() as stats:
+                        started = time.perf_counter()
+                        response = self.request(client, method, path, data)
+                        elapsed = time.perf_counter() - started
+                    self.recorder.add(endpoint, elapsed, stats.queries, response.status_code < 400)
+                    self.handle(endpoint, response)
+                    # The test client keeps the connection open between requests, a real handler gives it back
+                    close_old_connections()
+        finally:
+            connections.close_all()
+
+    async def arun(self, iterations):
+        client = AsyncClient()
+        for iteration in range(iterations):
+            for endpoint, method, path, data in self.steps(iteration):
+                with metrics.collect() as stats:
+                    started = time.perf_counter()
+                    response = await self.request(client, method, path, data)
+                    elapsed = time.perf_counter() - started
+                self.recorder.add(endpoint, elapsed, stats.queries, response.status_code < 400)
+                self.handle(endpoint, response)
+
+
+def run(mode, concurrency, iterations):
+    """Drives the WSGI or ASGI handler in process, without a server or sockets in between."""
+    players = list(Player.objects.filter(name=PLAYER_NAME).order_by('pk')[:concurrency])
+    quizzes = list(Quiz.objects.filter(title__startswith=QUIZ_TITLE, verified=True).values_list('pk', flat=True))
+    if len(players) < concurrency or not quizzes:
+        raise ValueError(f'Seed at least {concurrency} players and one quiz first.')
+
+    metrics.track_queries()
+    recorder = Recorder()
+    register_phones = iter(random.sample(range(REGISTER_PHONE_START, 10 ** 9), concurrency * iterations))
+    scenarios = [Scenario(mode, player, quizzes, recorder, register_phones) for player in players]
+
+    # The test client always sends Host: testserver, and every virtual player shares its address and would
+    # exhaust the login bucket at once
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], THROTTLE_ENABLED=False):
+        started = time.perf_counter()
+        if mode == 'asgi':
+            async def play():
+                await asyncio.gather(*(scenario.arun(iterations) for scenario in scenarios))
+            asyncio.run(play())
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                for result in [executor.submit(scenario.run, iterations) for scenario in scenarios]:
+                    result.result()
+    wall_time = time.perf_counter() - started
+    return {
+        'mode': mode,
+        'concurrency': concurrency,
+        'iterations': iterations,
+        **recorder.report(wall_time),
+    }
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'debug': settings.DEBUG,
+        'cache': settings.CACHES['default']['BACKEND'],
+    }
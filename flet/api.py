@@ -0,0 +1,118 @@
+import threading
+from time import sleep, time
+
+import httpx
+
+from cache import ResponseCache
+
+BASE_URL = "http://localhost:8000"
+
+RETRIES = 2
+RETRY_BACKOFF = 0.5  # Seconds, doubled after every attempt
+RETRY_STATUSES = (502, 503, 504)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+# One client for the whole app, so requests reuse keep-alive connections instead of opening a new
+# TCP connection every time. httpx clients are thread safe.
+client = httpx.Client(
+    base_url=BASE_URL,
+    timeout=httpx.Timeout(10.0, connect=5.0),
+    limits=httpx.Limits(max_connections=10, max_keepalive_connections=10, keepalive_expiry=60),
+)
+
+ApiError = httpx.HTTPError
+
+response_cache = ResponseCache()
+
+access_token = None
+refresh_token = None
+access_token_expires_at = None
+_refresh_lock = threading.Lock()
+
+
+def store_tokens(token_data):
+    global access_token, refresh_token, access_token_expires_at
+    access_token = token_data['access']
+    refresh_token = token_data['refresh']
+    access_token_expires_at = time() + token_data['expires_in']
+    if 'id' in token_data:
+        # Cached responses belong to the player who fetched them
+        response_cache.scope = token_data['id']
+
+
+def auth_headers():
+    # Refresh the access token shortly before it expires so requests never carry a stale one
+    with _refresh_lock:
+        if access_token_expires_at is not None and time() >= access_token_expires_at - 30:
+            response = request("POST", "/api/account/token/refresh/", json={"refresh": refresh_token}, auth=False)
+            if response.status_code == 200:
+                store_tokens(response.json())
+
+    return {"Authorization": f"Bearer {access_token}"}
+
+
+def request(method, url, auth=True, **kwargs):
+    headers = kwargs.pop('headers', {})
+    if auth and access_token is not None:
+        headers.update(auth_headers())
+
+    # Requests that can be repeated safely are retried on timeouts and gateway errors. Anything else is
+    # only retried when the connection could not be opened, since the server never saw the request then.
+    idempotent = method in IDEMPOTENT_METHODS
+    for attempt in range(RETRIES + 1):
+        last_attempt = attempt == RETRIES
+        try:
+            response = client.request(method, url, headers=headers, **kwargs)
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            if last_attempt:
+                raise
+        except httpx.TransportError:
+            if last_attempt or not idempotent:
+                raise
+        else:
+            if last_attempt or not idempotent or response.status_code not in RETRY_STATUSES:
+                return response
+        sleep(RETRY_BACKOFF * 2 ** attempt)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def cached_get(url, revalidate=False, **kwargs):
+    # Fresh entries are served without a request, stale ones are revalidated and a 304 reuses the stored body
+    entry = response_cache.get(url)
+    if entry is not None and not revalidate and entry["expires"] > time():
+        return cached_response(url, entry)
+
+    headers = kwargs.pop('headers', {})
+    if entry is not None:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    response = get(url, headers=headers, **kwargs)
+    if response.status_code == 304 and entry is not None:
+        response_cache.refresh(url, entry, response)
+        return cached_response(url, entry)
+    if response.status_code == 200:
+        response_cache.store(url, response)
+    return response
+
+
+def cached_response(url, entry):
+    return httpx.Response(200, content=entry["body"].encode(), headers={"Content-Type": entry["content_type"]},
+                          request=client.build_request("GET", url))
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def patch(url, **kwargs):
+    return request("PATCH", url, **kwargs)
+
+
+def delete(url, **kwargs):
+    return request("DELETE", url, **kwargs)
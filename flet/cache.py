@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from time import time
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".quizapp", "cache")
+MEMORY_ENTRIES = 256
+
+
+class ResponseCache:
+    """GET responses kept in memory and on disk, keyed by user and URL, with the validators to revalidate them."""
+
+    def __init__(self, directory=CACHE_DIR, memory_entries=MEMORY_ENTRIES):
+        self.directory = directory
+        self.memory_entries = memory_entries
+        self.memory = {}
+        self.lock = threading.Lock()
+        self.scope = "anonymous"
+
+    def key(self, url):
+        return hashlib.sha256(f"{self.scope}:{url}".encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, url):
+        key = self.key(url)
+        with self.lock:
+            entry = self.memory.get(key)
+        if entry is not None:
+            return entry
+
+        try:
+            with open(self.path(key), "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self.remember(key, entry)
+        return entry
+
+    def store(self, url, response):
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag is None and last_modified is None or "no-store" in response.headers.get("Cache-Control", ""):
+            return
+
+        entry = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "expires": time() + max_age(response.headers.get("Cache-Control", "")),
+            "content_type": response.headers.get("Content-Type", "application/json"),
+            "body": response.text,
+        }
+        key = self.key(url)
+        self.remember(key, entry)
+        self.write(key, entry)
+
+    def refresh(self, url, entry, response):
+        # A 304 confirms the stored body, only its freshness is renewed
+        entry["expires"] = time() + max_age(response.headers.get("Cache-Control", ""))
+        key = self.key(url)
+        self.remember(key, entry)
+        self.write(key, entry)
+
+    def remember(self, key, entry):
+        with self.lock:
+            self.memory.pop(key, None)
+            self.memory[key] = entry
+            while len(self.memory) > self.memory_entries:
+                self.memory.pop(next(iter(self.memory)))
+
+    def write(self, key, entry):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temporary = f"{self.path(key)}.{threading.get_ident()}.tmp"
+            with open(temporary, "w") as f:
+                json.dump(entry, f)
+            os.replace(temporary, self.path(key))
+        except OSError as e:
+            print(f"Error writing the response cache: {e}")
+
+
+def max_age(cache_control):
+    if "no-cache" in cache_control or "no-store" in cache_control:
+        return 0
+    match = re.search(r"max-age=(\d+)", cache_control)
+    return int(match.group(1)) if match else 0
@@ -1,8 +1,11 @@
 import flet as ft
 import os
-import requests
+import threading
+from functools import wraps
 from time import sleep
 
+import api
+
 theme_color = ft.Colors.BLUE_400
 card_color = ft.Colors.GREY_800
 text_color = ft.Colors.WHITE
@@ -20,7 +23,12 @@ user_phone = None
 user_password = None
 user_name = None
 user_display_name = None
+next_quizzes_url = None
+loading_quizzes = False
 selected_answers = {}
+prefetched_questions = {}
+pending_requests = 0
+pending_requests_lock = threading.Lock()
 
 
 def main(page: ft.Page):
@@ -31,22 +39,75 @@ def main(page: ft.Page):
     page.theme_mode = ft.ThemeMode.DARK
 
     if os.path.exists(CREDENTIALS_FILE):
-        try:
-            with open(CREDENTIALS_FILE, 'r') as f:
-                phone, password = f.read().strip().split(',')
-                if authenticate_user(page, phone, password):
-                    global user_phone, user_password
-                    user_phone = phone
-                    user_password = password
-                    show_main_menu(page)
-                else:
-                    show_login_form(page, phone, password)
-        except ValueError:
-            show_login_form(page)
+        run_in_background(page, login_with_saved_credentials, page, screen=True)
     else:
         show_login_form(page)
 
 
+def login_with_saved_credentials(page: ft.Page):
+    global user_phone, user_password
+    try:
+        with open(CREDENTIALS_FILE, 'r') as f:
+            phone, password = f.read().strip().split(',')
+            if authenticate_user(page, phone, password):
+                user_phone = phone
+                user_password = password
+                show_main_menu(page)
+            else:
+                show_login_form(page, phone, password)
+    except ValueError:
+        show_login_form(page)
+
+
+def show_loading(page: ft.Page):
+    page.clean()
+    page.add(ft.Column([ft.ProgressRing(color=theme_color), ft.Text("Loading...", color=text_color)],
+                       horizontal_alignment=ft.CrossAxisAlignment.CENTER))
+    page.update()
+
+
+def show_error_screen(page: ft.Page, message: str, back):
+    # Replaces the loading indicator of a screen whose data could not be fetched
+    page.clean()
+    back_button = ft.ElevatedButton("Back", on_click=lambda e: back(page), style=button_style)
+    page.add(ft.Text(message, color=ft.Colors.RED), back_button)
+    page.update()
+
+
+def set_request_pending(page: ft.Page, pending: bool):
+    # A progress bar is shown over the page while at least one request is in flight
+    global pending_requests
+    with pending_requests_lock:
+        pending_requests += 1 if pending else -1
+        page.splash = ft.ProgressBar(color=theme_color) if pending_requests else None
+    page.update()
+
+
+def run_in_background(page: ft.Page, handler, *args, screen: bool = False):
+    # Network calls run on a worker thread so the UI keeps handling events while a request is in flight.
+    # Screens are replaced by a loading indicator until their data arrives.
+    if screen:
+        show_loading(page)
+    set_request_pending(page, True)
+
+    def run():
+        try:
+            handler(*args)
+        finally:
+            set_request_pending(page, False)
+
+    page.run_thread(run)
+
+
+def in_background(screen: bool = False):
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(page: ft.Page, *args):
+            run_in_background(page, handler, page, *args, screen=screen)
+        return wrapper
+    return decorator
+
+
 def show_login_form(page: ft.Page, phone: str = "", password: str = "", error_message: str = ""):
     page.clean()
     title = ft.Text("Login", size=30, weight=ft.FontWeight.BOLD, color=text_color)
@@ -58,7 +119,7 @@ def show_login_form(page: ft.Page, phone: str = "", password: str = "", error_me
         error_text = ft.Text("Invalid credentials", color=ft.Colors.RED)
         page.add(error_text)
 
-    def on_login_click(e):
+    def login(e):
         global user_phone, user_password
         phone_value = phone_field.value
         password_value = password_field.value
@@ -71,7 +132,8 @@ def show_login_form(page: ft.Page, phone: str = "", password: str = "", error_me
                     f.write(f"{phone_value},{password_value}")
             show_main_menu(page)
 
-    login_button = ft.ElevatedButton("Login", on_click=on_login_click, style=button_style)
+    login_button = ft.ElevatedButton("Login", on_click=lambda e: run_in_background(page, login, e),
+                                     style=button_style)
 
     # Add Create Account Button
     create_account_button = ft.ElevatedButton("Create a New Account",
@@ -94,7 +156,7 @@ def show_create_account_page(page: ft.Page):
 
     error_text = ft.Text("", color=ft.Colors.RED)
 
-    def on_register_click(e):
+    def register(e):
         data = {
             "phone": phone_field.value,
             "name": name_field.value,
@@ -109,7 +171,7 @@ def show_create_account_page(page: ft.Page):
             return
 
         try:
-            response = requests.post("http://localhost:8000/api/account/register/", json=data)
+            response = api.post("/api/account/register/", json=data, auth=False)
             print(response.json())
             if response.status_code == 201:
                 # Successful registration
@@ -131,12 +193,13 @@ def show_create_account_page(page: ft.Page):
 
                 page.add(error_text)
 
-        except requests.exceptions.RequestException as e:
+        except api.ApiError as e:
             print(f"Error during registration: {e}")
             error_text.value = "Failed to create account."
             page.add(error_text)
 
-    register_button = ft.ElevatedButton("Register", on_click=on_register_click, style=button_style)
+    register_button = ft.ElevatedButton("Register", on_click=lambda e: run_in_background(page, register, e),
+                                        style=button_style)
     back_button = ft.ElevatedButton("Back to Login", on_click=lambda e: show_login_form(page), style=button_style)
 
     page.add(title,
@@ -152,7 +215,12 @@ def show_create_account_page(page: ft.Page):
 
 
 def authenticate_user(page: ft.Page, phone: str, password: str) -> bool:
-    response = requests.post("http://localhost:8000/api/account/login/", json={"phone": phone, "password": password})
+    try:
+        response = api.post("/api/account/login/", json={"phone": phone, "password": password}, auth=False)
+    except api.ApiError as e:
+        print(f"Error during login: {e}")
+        show_login_form(page, phone, password, "Login failed")
+        return False
 
     if response.status_code == 200:
         player_data = response.json()
@@ -160,6 +228,7 @@ def authenticate_user(page: ft.Page, phone: str, password: str) -> bool:
         user_id = player_data['id']
         user_name = player_data['name']
         user_display_name = player_data['display_name']
+        api.store_tokens(player_data)
         return True
     else:
         show_login_form(page, phone, password, "Invalid credentials")
@@ -199,18 +268,23 @@ def show_main_menu(page: ft.Page):
     page.update()
 
 
+@in_background(screen=True)
 def show_account_info(page: ft.Page):
-    if user_id is not None and user_phone is not None and user_password is not None:
-        response = requests.get(f"http://localhost:8000/api/account/profile/{user_id}/",
-                                auth=(user_phone, user_password))
+    if user_id is not None and api.access_token is not None:
+        try:
+            response = api.cached_get(f"/api/account/profile/{user_id}/")
+        except api.ApiError as e:
+            print(f"Error fetching account information: {e}")
+            show_error_screen(page, "Error retrieving account information.", show_main_menu)
+            return
 
         if response.status_code == 200:
             player_data = response.json()
             display_account_info(page, player_data)
         else:
-            page.add(ft.Text("Error retrieving account information.", color=ft.Colors.RED))
+            show_error_screen(page, "Error retrieving account information.", show_main_menu)
     else:
-        page.add(ft.Text("User not authenticated.", color=ft.Colors.RED))
+        show_error_screen(page, "User not authenticated.", show_main_menu)
 
 
 def display_account_info(page: ft.Page, player_data):
@@ -266,8 +340,9 @@ def show_update_info(page: ft.Page):
     name_field = ft.TextField(label="Name", value=user_name)
     display_name_field = ft.TextField(label="Display Name", value=user_display_name)
 
-    save_button = ft.ElevatedButton("Save", on_click=lambda e: update_user_info(phone_field.value, name_field.value,
-                                                                                display_name_field.value, page),
+    save_button = ft.ElevatedButton("Save", on_click=lambda e: run_in_background(page, update_user_info,
+                                                                                 phone_field.value, name_field.value,
+                                                                                 display_name_field.value, page),
                                     style=button_style)
 
     back_button = ft.ElevatedButton("Back to Account Info", on_click=lambda e: show_account_info(page),
@@ -287,8 +362,12 @@ def update_user_info(updated_phone: str, updated_name: str, updated_display_name
         "display_name": updated_display_name,
     }
 
-    response = requests.patch(f"http://localhost:8000/api/account/profile/{user_id}/update/", json=data_to_update,
-                              auth=(user_phone, user_password))
+    try:
+        response = api.patch(f"/api/account/profile/{user_id}/update/", json=data_to_update)
+    except api.ApiError as e:
+        print(f"Error updating account information: {e}")
+        page.add(ft.Text("Failed to update account information.", color=ft.Colors.RED))
+        return
 
     if response.status_code == 200:
         user_phone = updated_phone
@@ -317,24 +396,40 @@ def show_start_quiz_menu(page: ft.Page):
     page.clean()
 
     title = ft.Text("Available Quizzes", size=30, weight=ft.FontWeight.BOLD, color=text_color)
-    reload_button = ft.ElevatedButton("Reload", on_click=lambda e: load_quizzes(page), style=button_style)
 
-    quiz_list_container = ft.Column()
+    def on_quiz_list_scroll(e):
+        # Infinite scrolling: fetch the next cursor page once the list is scrolled near its end
+        if next_quizzes_url and not loading_quizzes and e.pixels >= e.max_scroll_extent - 100:
+            load_quizzes(page, quiz_list_container, next_quizzes_url)
+
+    quiz_list_container = ft.Column(scroll=ft.ScrollMode.AUTO, height=page.height - 250,
+                                    on_scroll=on_quiz_list_scroll, on_scroll_interval=100)
+    def reload_quizzes(e):
+        # A second first-page fetch would clear the list while the first one is still appending to it
+        if not loading_quizzes:
+            load_quizzes(page, quiz_list_container, revalidate=True)
+
+    reload_button = ft.ElevatedButton("Reload", on_click=reload_quizzes, style=button_style)
 
     page.add(title, reload_button, quiz_list_container)
 
-    load_quizzes(page)
+    load_quizzes(page, quiz_list_container)
 
     back_button = ft.ElevatedButton("Back to Main Menu", on_click=lambda e: show_main_menu(page), style=button_style)
     page.add(back_button)
 
 
+@in_background(screen=True)
 def show_quiz_details(page: ft.Page, quiz_id: int):
-    page.clean()
+    # Fetch the questions while the player reads the details, so Start only has to register the game. Questions
+    # kept from an earlier visit are dropped first, the quiz may have been edited since.
+    prefetched_questions.pop(quiz_id, None)
+    page.run_thread(prefetch_questions, quiz_id)
     try:
-        response = requests.get(f"http://localhost:8000/api/quiz/{quiz_id}", auth=(user_phone, user_password))
+        response = api.cached_get(f"/api/quiz/{quiz_id}/")
         response.raise_for_status()
         quiz_data = response.json()
+        page.clean()
 
         title = ft.Text(quiz_data['title'], size=30, weight=ft.FontWeight.BOLD, color=text_color)
         author_text = ft.Text(f"Author: {quiz_data['author']['display_name']}", size=20)
@@ -366,43 +461,61 @@ def show_quiz_details(page: ft.Page, quiz_id: int):
         page.add(info_container)
         page.update()
 
-    except requests.exceptions.RequestException as e:
+    except api.ApiError as e:
         print(f"Error fetching quiz details: {e}")
-        page.add(ft.Text("Failed to load quiz details.", color=ft.Colors.RED))
+        show_error_screen(page, "Failed to load quiz details.", show_start_quiz_menu)
+
+
+def prefetch_questions(quiz_id: int):
+    try:
+        response = api.get(f"/api/quiz/{quiz_id}/bundle/")
+        response.raise_for_status()
+        prefetched_questions[quiz_id] = response.json()['questions']
+    except api.ApiError as e:
+        print(f"Error prefetching quiz questions: {e}")
 
 
+@in_background()
 def start_quiz(page: ft.Page, quiz_id: int):
+    questions = prefetched_questions.get(quiz_id)
     data = {
         "player_id": user_id,
-        "quiz_id": quiz_id
+        "quiz_id": quiz_id,
+        # The server sends the questions along when the prefetch has not finished (or failed)
+        "include_questions": questions is None
     }
 
     try:
-        response = requests.post("http://localhost:8000/api/quiz/start_quiz/", json=data,
-                                 auth=(user_phone, user_password))
+        response = api.post("/api/quiz/start_quiz/", json=data)
 
         if response.status_code == 200:
+            prefetched_questions.pop(quiz_id, None)
+            if questions is None and response.content:
+                questions = response.json()['questions']
+
             # Navigate to the questions page
-            show_quiz_questions(page, quiz_id)
+            show_quiz_questions(page, quiz_id, questions)
         else:
             error_message = response.json().get('error', 'An unknown error occurred.')
             page.add(ft.Text(error_message, color=ft.Colors.RED))
 
-    except requests.exceptions.RequestException as e:
+    except api.ApiError as e:
         print(f"Error starting the quiz: {e}")
         page.add(ft.Text("Failed to start the quiz.", color=ft.Colors.RED))
 
 
-def show_quiz_questions(page: ft.Page, quiz_id: int):
+@in_background(screen=True)
+def show_quiz_questions(page: ft.Page, quiz_id: int, questions_data: list = None):
     global selected_answers  # Declare it as global to modify it
 
-    page.clean()  # Clear current content
-
     try:
-        # Fetch quiz questions from the API
-        response = requests.get(f"http://localhost:8000/api/quiz/{quiz_id}/questions", auth=(user_phone, user_password))
-        response.raise_for_status()
-        questions_data = response.json()
+        if questions_data is None:
+            # Fetch the cached quiz bundle, which carries the questions without their answers
+            response = api.get(f"/api/quiz/{quiz_id}/bundle/")
+            response.raise_for_status()
+            questions_data = response.json()['questions']
+
+        page.clean()  # Clear current content
 
         # Create a scrollable column for questions
         question_column = ft.Column(scroll=ft.ScrollMode.ALWAYS)  # Make this column scrollable
@@ -448,11 +561,12 @@ def show_quiz_questions(page: ft.Page, quiz_id: int):
         page.add(scrollable_container)
         page.update()
 
-    except requests.exceptions.RequestException as e:
+    except api.ApiError as e:
         print(f"Error fetching quiz questions: {e}")
-        page.add(ft.Text("Failed to load quiz questions.", color=ft.Colors.RED))
+        show_error_screen(page, "Failed to load quiz questions.", show_start_quiz_menu)
 
 
+@in_background()
 def submit_quiz(page: ft.Page, quiz_id: int):
     global selected_answers  # Declare it as global to access it
 
@@ -465,8 +579,7 @@ def submit_quiz(page: ft.Page, quiz_id: int):
 
     try:
         # Send POST request to finish the quiz
-        response = requests.post("http://localhost:8000/api/quiz/finish_quiz/", json=data,
-                                 auth=(user_phone, user_password))
+        response = api.post("/api/quiz/finish_quiz/", json=data)
 
         if response.status_code == 200:
             result_data = response.json()
@@ -478,7 +591,7 @@ def submit_quiz(page: ft.Page, quiz_id: int):
             error_message = response.json().get('error', 'An unknown error occurred.')
             page.add(ft.Text(error_message, color=ft.Colors.RED))
 
-    except requests.exceptions.RequestException as e:
+    except api.ApiError as e:
         print(f"Error submitting quiz: {e}")
         page.add(ft.Text("Failed to submit quiz.", color=ft.Colors.RED))
 
@@ -496,15 +609,26 @@ def show_quiz_result(page: ft.Page, score: float):
     page.update()
 
 
-def load_quizzes(page: ft.Page):
+def load_quizzes(page: ft.Page, quiz_list: ft.Column, url: str = None, revalidate: bool = False):
+    global loading_quizzes
+    # Set before the request is sent so scroll events fired meanwhile do not fetch the same page again
+    loading_quizzes = True
+    run_in_background(page, fetch_quizzes, page, quiz_list, url, revalidate)
+
+
+def fetch_quizzes(page: ft.Page, quiz_list: ft.Column, url: str = None, revalidate: bool = False):
+    global next_quizzes_url, loading_quizzes
     try:
-        response = requests.get("http://localhost:8000/api/quiz/", auth=(user_phone, user_password))
+        if url is None:
+            url = "/api/quiz/?pagination=cursor"
+            quiz_list.controls.clear()
+
+        response = api.cached_get(url, revalidate=revalidate)
         response.raise_for_status()
 
         data = response.json()
         quizzes = data.get('results', [])
-
-        page.controls[2].controls.clear()
+        next_quizzes_url = data.get('next')
 
         if quizzes:
             for quiz in quizzes:
@@ -531,33 +655,32 @@ def load_quizzes(page: ft.Page):
                     shadow=[ft.BoxShadow(blur_radius=10, color="rgba(0, 0, 0, 0.2)", offset=ft.Offset(0, 4))]
                 )
 
-                page.controls[2].controls.append(quiz_box)
+                quiz_list.controls.append(quiz_box)
 
             page.update()
-        else:
-            page.controls[2].controls.append(ft.Text("No available quizzes.", size=20))
+        elif not quiz_list.controls:
+            quiz_list.controls.append(ft.Text("No available quizzes.", size=20))
             page.update()
 
-    except requests.exceptions.RequestException as e:
+    except api.ApiError as e:
         print(f"Error fetching quizzes: {e}")
-        page.controls[2].controls.append(ft.Text("Failed to load quizzes.", color=ft.Colors.RED))
+        quiz_list.controls.append(ft.Text("Failed to load quizzes.", color=ft.Colors.RED))
         page.update()
+    finally:
+        loading_quizzes = False
 
 
+@in_background(screen=True)
 def show_make_quiz_menu(page: ft.Page):
-    page.clean()  # Clear current content
-
     title = ft.Text("My Quizzes", size=30, weight=ft.FontWeight.BOLD, color=text_color)
+    quiz_list = ft.Column(scroll=ft.ScrollMode.ALWAYS)  # Make this column scrollable
 
     # Fetch quizzes for the player
     try:
-        response = requests.get(f"http://localhost:8000/api/quiz/{user_id}/my_quizzes",
-                                auth=(user_phone, user_password))
+        response = api.get(f"/api/quiz/{user_id}/my_quizzes/?stream=json")
         response.raise_for_status()
         quizzes_data = response.json()
 
-        quiz_list = ft.Column(scroll=ft.ScrollMode.ALWAYS)  # Make this column scrollable
-
         if quizzes_data:
             for quiz in quizzes_data:
                 author_display_name = quiz['author']['display_name']
@@ -594,10 +717,12 @@ def show_make_quiz_menu(page: ft.Page):
         else:
             quiz_list.controls.append(ft.Text("No quizzes found.", size=20))
 
-    except requests.exceptions.RequestException as e:
+    except api.ApiError as e:
         print(f"Error fetching quizzes: {e}")
         quiz_list.controls.append(ft.Text("Failed to load quizzes.", color=ft.Colors.RED))
 
+    page.clean()  # Clear current content
+
     # Add buttons for adding a new quiz and going back
     add_quiz_button = ft.ElevatedButton("Add Quiz", on_click=lambda e: show_add_quiz_page(page), style=button_style)
     back_button = ft.ElevatedButton("Back to Main Menu", on_click=lambda e: show_main_menu(page), style=button_style)
@@ -607,9 +732,10 @@ def show_make_quiz_menu(page: ft.Page):
     page.update()
 
 
+@in_background()
 def delete_quiz(page: ft.Page, quiz_id: int):
     try:
-        response = requests.delete(f"http://localhost:8000/api/quiz/{quiz_id}/", auth=(user_phone, user_password))
+        response = api.delete(f"/api/quiz/{quiz_id}/")
         if response.status_code == 204:
             page.add(ft.Text("Quiz deleted successfully!", color=ft.Colors.GREEN))
             show_make_quiz_menu(page)  # Refresh the list of quizzes
@@ -617,7 +743,7 @@ def delete_quiz(page: ft.Page, quiz_id: int):
             error_message = response.json().get('error', 'An unknown error occurred.')
             page.add(ft.Text(error_message, color=ft.Colors.RED))
 
-    except requests.exceptions.RequestException as e:
+    except api.ApiError as e:
         print(f"Error deleting quiz: {e}")
         page.add(ft.Text("Failed to delete quiz.", color=ft.Colors.RED))
 
@@ -640,7 +766,7 @@ def show_add_quiz_page(page: ft.Page):
         }
 
         try:
-            response = requests.post("http://localhost:8000/api/quiz/", json=data, auth=(user_phone, user_password))
+            response = api.post("/api/quiz/", json=data)
             if response.status_code == 201:
                 page.add(ft.Text("Quiz created successfully!", color=ft.Colors.GREEN))
                 show_make_quiz_menu(page)  # Navigate back to the quizzes menu
@@ -648,11 +774,12 @@ def show_add_quiz_page(page: ft.Page):
                 error_message = response.json().get('error', 'An unknown error occurred.')
                 page.add(ft.Text(error_message, color=ft.Colors.RED))
 
-        except requests.exceptions.RequestException as e:
+        except api.ApiError as e:
             print(f"Error creating quiz: {e}")
             page.add(ft.Text("Failed to create quiz.", color=ft.Colors.RED))
 
-    save_button = ft.ElevatedButton("Save", on_click=save_quiz, style=button_style)
+    save_button = ft.ElevatedButton("Save", on_click=lambda e: run_in_background(page, save_quiz, e),
+                                    style=button_style)
     cancel_button = ft.ElevatedButton("Cancel", on_click=lambda e: show_make_quiz_menu(page), style=button_style)
 
     page.add(title, quiz_title_field, quiz_description_field, available_time_field, save_button, cancel_button)
@@ -663,14 +790,13 @@ def edit_quiz(page: ft.Page, quiz_id):
     show_edit_quiz_page(page, quiz_id)  # Call the function to show the edit page
 
 
+@in_background(screen=True)
 def show_edit_quiz_page(page: ft.Page, quiz_id: int):
-    page.clean()  # Clear current content
-
     title = ft.Text("Edit Quiz", size=30, weight=ft.FontWeight.BOLD, color=text_color)
 
     # Fetch quiz details
     try:
-        response = requests.get(f"http://localhost:8000/api/quiz/{quiz_id}/", auth=(user_phone, user_password))
+        response = api.get(f"/api/quiz/{quiz_id}/")
         response.raise_for_status()
         quiz_data = response.json()
 
@@ -705,8 +831,7 @@ def show_edit_quiz_page(page: ft.Page, quiz_id: int):
             }
 
             try:
-                response = requests.patch(f"http://localhost:8000/api/quiz/{quiz_id}/", json=data,
-                                          auth=(user_phone, user_password))
+                response = api.patch(f"/api/quiz/{quiz_id}/", json=data)
                 if response.status_code == 200:
                     page.add(ft.Text("Quiz updated successfully!", color=ft.Colors.GREEN))
                     show_make_quiz_menu(page)  # Navigate back to the quizzes menu
@@ -714,17 +839,17 @@ def show_edit_quiz_page(page: ft.Page, quiz_id: int):
                     error_message = response.json().get('error', 'An unknown error occurred.')
                     page.add(ft.Text(error_message, color=ft.Colors.RED))
 
-            except requests.exceptions.RequestException as e:
+            except api.ApiError as e:
                 print(f"Error updating quiz: {e}")
                 page.add(ft.Text("Failed to update quiz.", color=ft.Colors.RED))
 
-        save_button = ft.ElevatedButton("Save", on_click=save_quiz, style=button_style)
+        save_button = ft.ElevatedButton("Save", on_click=lambda e: run_in_background(page, save_quiz, e),
+                                        style=button_style)
 
         # Fetch questions for this quiz
         questions_container = ft.Column(scroll=True)  # To hold the list of questions and make it scrollable
         try:
-            questions_response = requests.get(f"http://localhost:8000/api/quiz/{quiz_id}/questions",
-                                              auth=(user_phone, user_password))
+            questions_response = api.get(f"/api/quiz/{quiz_id}/questions/?stream=json")
             questions_response.raise_for_status()
             questions_data = questions_response.json()
 
@@ -762,11 +887,12 @@ def show_edit_quiz_page(page: ft.Page, quiz_id: int):
             else:
                 questions_container.controls.append(ft.Text("No questions found.", size=20))
 
-        except requests.exceptions.RequestException as e:
+        except api.ApiError as e:
             print(f"Error fetching questions: {e}")
             questions_container.controls.append(ft.Text("Failed to load questions.", color=ft.Colors.RED))
 
         # Add all components to the page
+        page.clean()  # Clear current content
         page.add(title,
                  quiz_title_field,
                  quiz_description_field,
@@ -780,18 +906,18 @@ def show_edit_quiz_page(page: ft.Page, quiz_id: int):
                  back_button,
                  questions_container)
 
-    except requests.exceptions.RequestException as e:
+    except api.ApiError as e:
         print(f"Error fetching quiz details: {e}")
-        page.add(ft.Text("Failed to load quiz details.", color=ft.Colors.RED))
+        show_error_screen(page, "Failed to load quiz details.", show_make_quiz_menu)
+        return
 
     page.update()
 
 
+@in_background()
 def delete_question(page: ft.Page, quiz_id: int, question_id: int):
     try:
-        response = requests.delete(f"http://localhost:8000/api/quiz/{quiz_id}/questions/",
-                                   json={"id": question_id},
-                                   auth=(user_phone, user_password))
+        response = api.delete(f"/api/quiz/{quiz_id}/questions/", json={"id": question_id})
 
         if response.status_code == 204:
             page.add(ft.Text("Question deleted successfully!", color=ft.Colors.GREEN))
@@ -800,7 +926,7 @@ def delete_question(page: ft.Page, quiz_id: int, question_id: int):
             error_message = response.json().get('error', 'An unknown error occurred.')
             page.add(ft.Text(error_message, color=ft.Colors.RED))
 
-    except requests.exceptions.RequestException as e:
+    except api.ApiError as e:
         print(f"Error deleting question: {e}")
         page.add(ft.Text("Failed to delete question.", color=ft.Colors.RED))
 
@@ -809,19 +935,18 @@ def edit_question(page: ft.Page, question_id: int, quiz_id: int):
     show_edit_question_page(page, quiz_id, question_id)  # Call the function to show the edit page
 
 
+@in_background(screen=True)
 def show_edit_question_page(page: ft.Page, quiz_id: int, question_id: int):
-    page.clean()  # Clear current content
-
     title = ft.Text("Edit Question", size=30, weight=ft.FontWeight.BOLD, color=text_color)
 
     # Fetch question details
     try:
-        response = requests.get(f"http://localhost:8000/api/quiz/{quiz_id}/questions/",
-                                json={"id": question_id},
-                                auth=(user_phone, user_password))
+        response = api.get(f"/api/quiz/{quiz_id}/questions/", json={"id": question_id})
         response.raise_for_status()
         question_data = response.json()
 
+        page.clean()  # Clear current content
+
         # Display question information
         question_field = ft.TextField(label="Question", value=question_data['question'], autofocus=True)
         option_a_field = ft.TextField(label="Option A", value=question_data['option_a'])
@@ -847,8 +972,7 @@ def show_edit_question_page(page: ft.Page, quiz_id: int, question_id: int):
             }
 
             try:
-                response = requests.patch(f"http://localhost:8000/api/quiz/{quiz_id}/questions/", json=data,
-                                          auth=(user_phone, user_password))
+                response = api.patch(f"/api/quiz/{quiz_id}/questions/", json=data)
                 if response.status_code == 200:
                     page.add(ft.Text("Question updated successfully!", color=ft.Colors.GREEN))
                     show_edit_quiz_page(page, quiz_id)  # Navigate back to the edit quiz page
@@ -856,11 +980,12 @@ def show_edit_question_page(page: ft.Page, quiz_id: int, question_id: int):
                     error_message = response.json().get('error', 'An unknown error occurred.')
                     page.add(ft.Text(error_message, color=ft.Colors.RED))
 
-            except requests.exceptions.RequestException as e:
+            except api.ApiError as e:
                 print(f"Error updating question: {e}")
                 page.add(ft.Text("Failed to update question.", color=ft.Colors.RED))
 
-        save_button = ft.ElevatedButton("Save", on_click=save_question, style=button_style)
+        save_button = ft.ElevatedButton("Save", on_click=lambda e: run_in_background(page, save_question, e),
+                                        style=button_style)
 
         # Add all components to the page
         page.add(title,
@@ -873,9 +998,10 @@ def show_edit_question_page(page: ft.Page, quiz_id: int, question_id: int):
                  save_button,
                  back_button)
 
-    except requests.exceptions.RequestException as e:
+    except api.ApiError as e:
         print(f"Error fetching question details: {e}")
-        page.add(ft.Text("Failed to load question details.", color=ft.Colors.RED))
+        show_error_screen(page, "Failed to load question details.", lambda page: show_edit_quiz_page(page, quiz_id))
+        return
 
     page.update()
 
@@ -904,8 +1030,7 @@ def show_add_question_page(page: ft.Page, quiz_id: int):
         }
 
         try:
-            response = requests.post(f"http://localhost:8000/api/quiz/{quiz_id}/questions/", json=data,
-                                     auth=(user_phone, user_password))
+            response = api.post(f"/api/quiz/{quiz_id}/questions/", json=data)
             if response.status_code == 201:
                 page.add(ft.Text("Question added successfully!", color=ft.Colors.GREEN))
                 show_edit_quiz_page(page, quiz_id)  # Navigate back to the edit quiz page
@@ -913,11 +1038,12 @@ def show_add_question_page(page: ft.Page, quiz_id: int):
                 error_message = response.json().get('error', 'An unknown error occurred.')
                 page.add(ft.Text(error_message, color=ft.Colors.RED))
 
-        except requests.exceptions.RequestException as e:
+        except api.ApiError as e:
             print(f"Error adding question: {e}")
             page.add(ft.Text("Failed to add question.", color=ft.Colors.RED))
 
-    save_button = ft.ElevatedButton("Save", on_click=save_question, style=button_style)
+    save_button = ft.ElevatedButton("Save", on_click=lambda e: run_in_background(page, save_question, e),
+                                    style=button_style)
     cancel_button = ft.ElevatedButton("Cancel", on_click=lambda e: show_edit_quiz_page(page, quiz_id),
                                       style=button_style)
 
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Quiz, Question
+from .models import Quiz, Question, QuizAttempt
+from .search import search_query
+from . import caches
 
 
 class QuestionInline(admin.StackedInline):
@@ -16,3 +18,32 @@ class QuizAdmin(admin.ModelAdmin):
     search_fields = ('title', 'description')
     date_hierarchy = 'created_at'
     inlines = [QuestionInline]
+
+    def get_search_results(self, request, queryset, search_term):
+        # Served by the full-text index instead of ILIKE scans over title and description
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(search_vector=search_query(search_term)), False
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        caches.invalidate_quiz(form.instance.pk)
+
+    def delete_model(self, request, obj):
+        quiz_id = obj.pk
+        super().delete_model(request, obj)
+        caches.invalidate_quiz(quiz_id)
+
+    def delete_queryset(self, request, queryset):
+        quiz_ids = list(queryset.values_list('pk', flat=True))
+        super().delete_queryset(request, queryset)
+        for quiz_id in quiz_ids:
+            caches.invalidate_quiz(quiz_id)
+
+
+@admin.register(QuizAttempt)
+class QuizAttemptAdmin(admin.ModelAdmin):
+    list_display = ('player', 'quiz', 'reward', 'finished_at')
+    list_select_related = ('player', 'quiz')
+    raw_id_fields = ('player', 'quiz')
+    date_hierarchy = 'finished_at'
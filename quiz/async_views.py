@@ -0,0 +1,152 @@
+import json
+import math
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import AuthenticationFailed, PermissionDenied
+
+from QuizAPP import throttling
+from account.authentication import TokenAuthentication
+from account.models import Player
+from account.services import acredit_score
+from .models import Quiz
+from .views import GameEndView, own_player_id, read_finish_request
+from . import attempts, caches, game_sessions
+
+# Native coroutine versions of the gameplay endpoints. They skip the DRF request cycle (which is
+# sync only) and authenticate with the same signed bearer tokens, so a request never blocks a worker
+# thread while it waits on Redis or PostgreSQL.
+
+
+def token_required(view):
+    authenticator = TokenAuthentication()
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            user_auth = authenticator.authenticate(request)
+        except AuthenticationFailed as e:
+            user_auth = None
+            detail = str(e.detail)
+        else:
+            detail = 'Authentication credentials were not provided.'
+
+        if user_auth is None:
+            response = JsonResponse({'detail': detail}, status=401)
+            response['WWW-Authenticate'] = authenticator.authenticate_header(request)
+            return response
+
+        request.user = user_auth[0]
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def throttled(scope):
+    # Draws from the same buckets as the DRF views, so switching handlers does not double a player's budget
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            rate = throttling.get_rate(scope) if settings.THROTTLE_ENABLED else None
+            if rate is not None:
+                bucket = await throttling.aconsume(scope, f'user:{request.user.pk}', *rate)
+                throttling.remember(request, bucket)
+                if not bucket.allowed:
+                    wait = math.ceil(bucket.wait)
+                    response = JsonResponse(
+                        {'detail': f'Request was throttled. Expected available in {wait} seconds.'}, status=429)
+                    response['Retry-After'] = wait
+                    return response
+            return await view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def read_json(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+@csrf_exempt
+@require_POST
+@token_required
+@throttled('start_quiz')
+async def start_quiz(request):
+    data = read_json(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON body.'}, status=400)
+
+    try:
+        player_id = own_player_id(request.user, data)
+    except PermissionDenied as e:
+        return JsonResponse({'error': str(e)}, status=403)
+
+    try:
+        quiz = await Quiz.objects.only('verified', 'available_time', 'score').aget(pk=data.get('quiz_id'))
+    except (Quiz.DoesNotExist, TypeError, ValueError):
+        return JsonResponse({'error': 'Quiz not found'}, status=404)
+
+    if not quiz.verified:
+        return JsonResponse({'error': 'Quiz is not verified.'}, status=403)
+    if not await game_sessions.astart_game(player_id, quiz):
+        return JsonResponse({'error': 'Quiz already started.'}, status=403)
+
+    if data.get('include_questions') is True:
+        bundle = await caches.aget_bundle(quiz.pk)
+        if bundle is not None:
+            return HttpResponse(bundle, content_type='application/json')
+
+    return HttpResponse(status=200)
+
+
+@csrf_exempt
+@require_POST
+@token_required
+@throttled('finish_quiz')
+async def finish_quiz(request):
+    data = read_json(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON body.'}, status=400)
+
+    try:
+        quiz_id, answers = read_finish_request(data)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    try:
+        player_id = own_player_id(request.user, data)
+    except PermissionDenied as e:
+        return JsonResponse({'error': str(e)}, status=403)
+
+    session = await game_sessions.afinish_game(player_id, quiz_id)
+    if session is None:
+        return JsonResponse({'error': 'You did not finish the quiz before timeout.'}, status=400)
+
+    answer_key = await caches.aget_answer_key(quiz_id)
+    reward = GameEndView().calculate_reward(answers, answer_key, session.score)
+
+    try:
+        await acredit_score(player_id, reward)
+    except Player.DoesNotExist:
+        await game_sessions.arestore_game(player_id, quiz_id, session)
+        return JsonResponse({'error': 'Player not found.'}, status=404)
+    await attempts.arecord(player_id, quiz_id, answers, reward, session.started_at)
+
+    return JsonResponse({'score': reward})
+
+
+@require_GET
+@token_required
+async def quiz_bundle(request, quiz):
+    bundle = await caches.aget_bundle(quiz)
+    if bundle is None:
+        return JsonResponse({'error': 'Quiz not found.'}, status=404)
+    return HttpResponse(bundle, content_type='application/json')
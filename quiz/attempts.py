@@ -0,0 +1,128 @@
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+
+from django.db import transaction
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
+
+from QuizAPP.async_redis import get_async_redis_connection
+from account.models import Player
+from .models import Quiz, QuizAttempt
+
+# Finished games are appended to a Redis list and inserted in batches by the flush_attempts command,
+# so finishing a game never waits on an INSERT.
+BUFFER_KEY = 'quiz:attempts:buffer'
+FLUSHING_KEY = 'quiz:attempts:flushing'
+FLUSH_BATCH_SIZE = 500
+LOCK_KEY = 'quiz:attempts:flush-lock'
+LOCK_TIMEOUT_MS = 60 * 1000
+
+TRIM_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('LTRIM', KEYS[2], ARGV[2], -1)
+redis.call('PEXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_trim_script = None
+_release_script = None
+
+
+def get_connection():
+    return get_redis_connection('default')
+
+
+def _payload(player_id, quiz_id, answers, reward, started_at):
+    return json.dumps({
+        'attempt_id': str(uuid.uuid4()),
+        'player_id': int(player_id),
+        'quiz_id': int(quiz_id),
+        'answers': answers if isinstance(answers, dict) else {},
+        'reward': reward,
+        'started_at': started_at,
+        'finished_at': time.time(),
+    })
+
+
+def record(player_id, quiz_id, answers, reward, started_at=None):
+    return get_connection().rpush(BUFFER_KEY, _payload(player_id, quiz_id, answers, reward, started_at))
+
+
+async def arecord(player_id, quiz_id, answers, reward, started_at=None):
+    return await get_async_redis_connection().rpush(BUFFER_KEY, _payload(player_id, quiz_id, answers, reward,
+                                                                          started_at))
+
+
+def pending():
+    connection = get_connection()
+    return connection.llen(BUFFER_KEY) + connection.llen(FLUSHING_KEY)
+
+
+def _timestamp(value):
+    return None if value is None else datetime.fromtimestamp(value, tz=timezone.utc)
+
+
+def _build_attempts(items):
+    entries = [json.loads(item) for item in items]
+    # Attempts of players or quizzes deleted in the meantime would fail the whole batch on the foreign keys
+    player_ids = set(Player.objects.filter(pk__in={entry['player_id'] for entry in entries})
+                     .values_list('pk', flat=True))
+    quiz_ids = set(Quiz.objects.filter(pk__in={entry['quiz_id'] for entry in entries}).values_list('pk', flat=True))
+    return [
+        QuizAttempt(attempt_id=entry['attempt_id'], player_id=entry['player_id'], quiz_id=entry['quiz_id'],
+                    answers=entry['answers'], reward=entry['reward'], started_at=_timestamp(entry['started_at']),
+                    finished_at=_timestamp(entry['finished_at']))
+        for entry in entries
+        if entry['player_id'] in player_ids and entry['quiz_id'] in quiz_ids
+    ]
+
+
+def flush(batch_size=FLUSH_BATCH_SIZE):
+    """
+    Moves the buffer aside and inserts it batch by batch. A batch leaves Redis only after its INSERT committed,
+    and the unique attempt_id makes inserting it again after a crash a no-op, so nothing is lost or duplicated.
+    One flush runs at a time: a second one would read the same head of the list and trim entries it never wrote.
+    """
+    global _trim_script, _release_script
+    connection = get_connection()
+    if _trim_script is None:
+        _trim_script = connection.register_script(TRIM_SCRIPT)
+        _release_script = connection.register_script(RELEASE_SCRIPT)
+
+    token = uuid.uuid4().hex
+    if not connection.set(LOCK_KEY, token, nx=True, px=LOCK_TIMEOUT_MS):
+        return 0
+
+    flushed = 0
+    try:
+        if not connection.exists(FLUSHING_KEY):
+            try:
+                connection.renamenx(BUFFER_KEY, FLUSHING_KEY)
+            except ResponseError:
+                return 0
+
+        while True:
+            items = connection.lrange(FLUSHING_KEY, 0, batch_size - 1)
+            if not items:
+                break
+            with transaction.atomic():
+                QuizAttempt.objects.bulk_create(_build_attempts(items), ignore_conflicts=True)
+            # Trims only while the lock is still ours, and renews it for the next batch
+            if not _trim_script(keys=[LOCK_KEY, FLUSHING_KEY], args=[token, len(items), LOCK_TIMEOUT_MS],
+                                client=connection):
+                break
+            flushed += len(items)
+    finally:
+        _release_script(keys=[LOCK_KEY], args=[token], client=connection)
+    return flushed
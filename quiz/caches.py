@@ -0,0 +1,120 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from rest_framework.renderers import JSONRenderer
+
+from QuizAPP.metrics import record_cache
+
+from .models import Quiz, Question
+from .serializers import QuizSerializer, PLAYER_QUESTION_FIELDS
+
+cache = caches['tiered']
+
+ANSWER_KEY_TIMEOUT = 60 * 60
+BUNDLE_TIMEOUT = 60 * 60
+
+
+def answer_key_cache_key(quiz_id):
+    return f'quiz:{quiz_id}:answer_key'
+
+
+CATALOGUE_VERSION_KEY = 'quiz:catalogue:version'
+
+
+def version_cache_key(quiz_id):
+    return f'quiz:{quiz_id}:version'
+
+
+def bundle_cache_key(quiz_id, version):
+    return f'quiz:{quiz_id}:bundle:{version}'
+
+
+def get_answer_key(quiz_id):
+    cache_key = answer_key_cache_key(quiz_id)
+    answer_key = cache.get(cache_key)
+    record_cache(answer_key is not None)
+    if answer_key is None:
+        answer_key = dict(Question.objects.filter(quiz_id=quiz_id).values_list('id', 'correct_answer'))
+        cache.set(cache_key, answer_key, timeout=ANSWER_KEY_TIMEOUT)
+    return answer_key
+
+
+def get_bundle(quiz_id):
+    version = cache.get_or_set(version_cache_key(quiz_id), 1, timeout=None)
+    cache_key = bundle_cache_key(quiz_id, version)
+    bundle = cache.get(cache_key)
+    record_cache(bundle is not None)
+    if bundle is None:
+        bundle = build_bundle(quiz_id)
+        if bundle is not None:
+            cache.set(cache_key, bundle, timeout=BUNDLE_TIMEOUT)
+    return bundle
+
+
+async def aget_answer_key(quiz_id):
+    cache_key = answer_key_cache_key(quiz_id)
+    answer_key = await cache.aget(cache_key)
+    record_cache(answer_key is not None)
+    if answer_key is None:
+        answer_key = {question_id: correct_answer async for question_id, correct_answer
+                      in Question.objects.filter(quiz_id=quiz_id).values_list('id', 'correct_answer')}
+        await cache.aset(cache_key, answer_key, timeout=ANSWER_KEY_TIMEOUT)
+    return answer_key
+
+
+async def aget_bundle(quiz_id):
+    version = await cache.aget_or_set(version_cache_key(quiz_id), 1, timeout=None)
+    cache_key = bundle_cache_key(quiz_id, version)
+    bundle = await cache.aget(cache_key)
+    record_cache(bundle is not None)
+    if bundle is None:
+        bundle = await sync_to_async(build_bundle)(quiz_id)
+        if bundle is not None:
+            await cache.aset(cache_key, bundle, timeout=BUNDLE_TIMEOUT)
+    return bundle
+
+
+def build_bundle(quiz_id):
+    quiz = Quiz.objects.filter(pk=quiz_id, verified=True).with_author().first()
+    if quiz is None:
+        return None
+
+    data = QuizSerializer(quiz).data
+    data['questions'] = list(quiz.questions.order_by('id').values(*PLAYER_QUESTION_FIELDS))
+    return JSONRenderer().render(data)
+
+
+def invalidate_answer_key(quiz_id):
+    cache.delete(answer_key_cache_key(quiz_id))
+
+
+def invalidate_bundle(quiz_id):
+    # Bumping the version orphans every bundle built so far, they expire on their own
+    try:
+        cache.incr(version_cache_key(quiz_id))
+    except ValueError:
+        pass
+
+
+def get_catalogue_version():
+    return cache.get_or_set(CATALOGUE_VERSION_KEY, 1, timeout=None)
+
+
+def invalidate_catalogue():
+    # Changes the ETag of every catalogue page, see QuizViewSet.list
+    try:
+        cache.incr(CATALOGUE_VERSION_KEY)
+    except ValueError:
+        pass
+
+
+def invalidate_author(player_id):
+    # Catalogue pages and the bundles of the author's quizzes show their display name
+    for quiz_id in Quiz.objects.filter(author_id=player_id, verified=True).values_list('pk', flat=True):
+        invalidate_bundle(quiz_id)
+    invalidate_catalogue()
+
+
+def invalidate_quiz(quiz_id):
+    invalidate_answer_key(quiz_id)
+    invalidate_bundle(quiz_id)
+    invalidate_catalogue()
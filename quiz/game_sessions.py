@@ -0,0 +1,112 @@
+import time
+from typing import NamedTuple
+
+from django_redis import get_redis_connection
+
+from QuizAPP.async_redis import get_async_redis_connection
+
+# Registers the session only if it does not exist yet and records it in the
+# player's index (a sorted set scored by expiry time) in the same round trip.
+START_SCRIPT = """
+if not redis.call('SET', KEYS[1], ARGV[1], 'NX', 'EX', ARGV[2]) then
+    return 0
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', ARGV[3])
+redis.call('ZADD', KEYS[2], ARGV[4], ARGV[5])
+if redis.call('TTL', KEYS[2]) < tonumber(ARGV[2]) then
+    redis.call('EXPIRE', KEYS[2], ARGV[2])
+end
+return 1
+"""
+
+_start_script = None
+
+
+class Session(NamedTuple):
+    score: int
+    started_at: float | None
+    expires_at: float | None = None
+
+
+def session_key(player_id, quiz_id):
+    return f'game:{player_id}:{quiz_id}'
+
+
+def index_key(player_id):
+    return f'game:{player_id}:active'
+
+
+def get_connection():
+    return get_redis_connection('default')
+
+
+def _start_arguments(player_id, quiz):
+    timeout = max(int(quiz.available_time.total_seconds()), 1)
+    now = time.time()
+    return {
+        'keys': [session_key(player_id, quiz.pk), index_key(player_id)],
+        'args': [f'{quiz.score}:{now}', timeout, now, now + timeout, quiz.pk],
+    }
+
+
+def start_game(player_id, quiz):
+    global _start_script
+    connection = get_connection()
+    if _start_script is None:
+        _start_script = connection.register_script(START_SCRIPT)
+    return bool(_start_script(client=connection, **_start_arguments(player_id, quiz)))
+
+
+async def astart_game(player_id, quiz):
+    connection = get_async_redis_connection()
+    script = connection.register_script(START_SCRIPT)
+    return bool(await script(client=connection, **_start_arguments(player_id, quiz)))
+
+
+def _finish_pipeline(pipe, player_id, quiz_id):
+    pipe.pttl(session_key(player_id, quiz_id))
+    pipe.getdel(session_key(player_id, quiz_id))
+    pipe.zrem(index_key(player_id), quiz_id)
+    return pipe
+
+
+def finish_game(player_id, quiz_id):
+    ttl, value, _ = _finish_pipeline(get_connection().pipeline(), player_id, quiz_id).execute()
+    return _read_session(value, ttl)
+
+
+async def afinish_game(player_id, quiz_id):
+    ttl, value, _ = await _finish_pipeline(get_async_redis_connection().pipeline(), player_id, quiz_id).execute()
+    return _read_session(value, ttl)
+
+
+def _restore_pipeline(pipe, player_id, quiz_id, session):
+    # Puts back a session finish_game() took when the finish could not be completed, with the time it had left
+    ttl = int((session.expires_at - time.time()) * 1000)
+    if ttl > 0:
+        value = session.score if session.started_at is None else f'{session.score}:{session.started_at}'
+        pipe.set(session_key(player_id, quiz_id), value, px=ttl, nx=True)
+        pipe.zadd(index_key(player_id), {quiz_id: session.expires_at})
+    return pipe
+
+
+def restore_game(player_id, quiz_id, session):
+    _restore_pipeline(get_connection().pipeline(), player_id, quiz_id, session).execute()
+
+
+async def arestore_game(player_id, quiz_id, session):
+    await _restore_pipeline(get_async_redis_connection().pipeline(), player_id, quiz_id, session).execute()
+
+
+def _read_session(value, ttl):
+    # Sessions store "score:start time", ones started before the start time was recorded only the score
+    if value is None:
+        return None
+    score, _, started_at = value.decode().partition(':')
+    expires_at = time.time() + ttl / 1000 if ttl > 0 else None
+    return Session(int(score), float(started_at) if started_at else None, expires_at)
+
+
+def active_quizzes(player_id):
+    quiz_ids = get_connection().zrangebyscore(index_key(player_id), time.time(), '+inf')
+    return [int(quiz_id) for quiz_id in quiz_ids]
@@ -0,0 +1,47 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from benchmarks import in_process
+
+
+class Command(BaseCommand):
+    help = ('Play the register, login, list, start, questions and finish scenario against the WSGI and ASGI '
+            'handlers in process and report latency percentiles, throughput and queries per request.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=('wsgi', 'asgi', 'both'), default='both')
+        parser.add_argument('--concurrency', type=int, default=10, help='Number of virtual players.')
+        parser.add_argument('--iterations', type=int, default=20, help='Scenario runs per virtual player.')
+        parser.add_argument('--format', choices=('text', 'json'), default='text')
+        parser.add_argument('--output', help='Also write the JSON results to this file.')
+
+    def handle(self, *args, **options):
+        modes = ('wsgi', 'asgi') if options['mode'] == 'both' else (options['mode'],)
+        try:
+            runs = [in_process.run(mode, options['concurrency'], options['iterations']) for mode in modes]
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        results = {'timestamp': timezone.now().isoformat(), 'environment': in_process.environment(), 'runs': runs}
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+
+        if options['format'] == 'json':
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        if results['environment']['debug']:
+            self.stdout.write(self.style.WARNING('DEBUG is on, which records every query and skews the numbers.'))
+        for run in runs:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{run["mode"]}: {run["requests"]} requests, {run["errors"]} errors, {run["throughput_rps"]} req/s'
+            ))
+            self.stdout.write(f'{"endpoint":<14}{"req/s":>9}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}'
+                              f'{"queries":>9}{"errors":>8}')
+            for endpoint, stats in run['endpoints'].items():
+                self.stdout.write(f'{endpoint:<14}{stats["throughput_rps"]:>9}{stats["p50_ms"]:>10}'
+                                  f'{stats["p95_ms"]:>10}{stats["p99_ms"]:>10}'
+                                  f'{stats["queries_per_request"]:>9}{stats["errors"]:>8}')
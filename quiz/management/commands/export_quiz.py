@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz import transfer
+from quiz.models import Quiz
+
+
+class Command(BaseCommand):
+    help = 'Export a quiz and its questions as JSON, NDJSON or CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_id', type=int)
+        parser.add_argument('--format', choices=transfer.FORMATS, default='ndjson')
+        parser.add_argument('--output', help='File to write to, defaults to stdout.')
+        parser.add_argument('--batch-size', type=int, default=transfer.BATCH_SIZE,
+                            help='Number of questions fetched per round trip.')
+
+    def handle(self, *args, **options):
+        try:
+            quiz = Quiz.objects.get(pk=options['quiz_id'])
+        except Quiz.DoesNotExist:
+            raise CommandError(f'Quiz {options["quiz_id"]} does not exist.')
+
+        chunks = transfer.export_quiz(quiz, options['format'], batch_size=options['batch_size'])
+        if options['output']:
+            with open(options['output'], 'w', newline='') as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
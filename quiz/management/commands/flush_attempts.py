@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from quiz import attempts
+
+POLL_INTERVAL = 0.5
+
+
+class Command(BaseCommand):
+    help = ('Insert buffered quiz attempts into the database. Runs as a worker that flushes once a full batch is '
+            'waiting or the interval has passed, or once with --once.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=attempts.FLUSH_BATCH_SIZE,
+                            help='Number of attempts inserted per query, a full batch is flushed right away.')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds a smaller batch may wait before it is flushed.')
+        parser.add_argument('--once', action='store_true', help='Flush what is buffered and exit.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        flushed = attempts.flush(batch_size)
+        if options['once']:
+            self.stdout.write(self.style.SUCCESS(f'Flushed {flushed} attempts.'))
+            return
+
+        connection = attempts.get_connection()
+        last_flush = time.monotonic()
+        while True:
+            buffered = connection.llen(attempts.BUFFER_KEY)
+            if buffered >= batch_size or buffered and time.monotonic() - last_flush >= options['interval']:
+                close_old_connections()
+                flushed = attempts.flush(batch_size)
+                last_flush = time.monotonic()
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'Flushed {flushed} attempts.')
+            time.sleep(POLL_INTERVAL)
@@ -0,0 +1,46 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from account.models import Player
+from quiz import transfer
+
+
+class Command(BaseCommand):
+    help = 'Import a quiz and its questions from a JSON, NDJSON or CSV file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import.')
+        parser.add_argument('--author', required=True, help='Phone number of the player the quiz belongs to.')
+        parser.add_argument('--format', choices=transfer.FORMATS,
+                            help='File format, guessed from the file extension when omitted.')
+        parser.add_argument('--title', help='Quiz title (CSV only).')
+        parser.add_argument('--description', help='Quiz description (CSV only).')
+        parser.add_argument('--available-time', help='Quiz duration as HH:MM:SS (CSV only).')
+        parser.add_argument('--score', type=int, help='Quiz score (CSV only).')
+        parser.add_argument('--batch-size', type=int, default=transfer.BATCH_SIZE,
+                            help='Number of questions inserted per query.')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or os.path.splitext(options['path'])[1].lstrip('.').lower()
+        if file_format not in transfer.FORMATS:
+            raise CommandError(f'Unknown format "{file_format}", pass --format.')
+
+        try:
+            author = Player.objects.get(phone=options['author'])
+        except Player.DoesNotExist:
+            raise CommandError(f'No player with phone {options["author"]}.')
+
+        metadata = {field: options[option] for field, option in (
+            ('title', 'title'), ('description', 'description'), ('available_time', 'available_time'),
+            ('score', 'score')) if options[option] is not None}
+
+        try:
+            with open(options['path'], 'rb') as stream:
+                metadata, rows = transfer.read_quiz(stream, file_format, metadata)
+                quiz, imported = transfer.import_quiz(author.pk, metadata, rows, batch_size=options['batch_size'])
+        except ValidationError as e:
+            raise CommandError(e.detail)
+
+        self.stdout.write(self.style.SUCCESS(f'Imported quiz {quiz.pk} with {imported} questions.'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from benchmarks import in_process
+
+
+class Command(BaseCommand):
+    help = 'Create players, verified quizzes and questions for the benchmark command to play with.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=100)
+        parser.add_argument('--quizzes', type=int, default=50)
+        parser.add_argument('--questions', type=int, default=20, help='Number of questions per quiz.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of rows inserted per query.')
+
+    def handle(self, *args, **options):
+        quizzes = in_process.seed(options['players'], options['quizzes'], options['questions'],
+                                 batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {options["players"]} players and {quizzes} quizzes with {options["questions"]} questions each.'
+        ))
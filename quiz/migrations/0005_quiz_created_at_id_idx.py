@@ -0,0 +1,19 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0004_alter_quiz_score'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['created_at', 'id'], name='quiz_created_at_id_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0005_quiz_created_at_id_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='quiz',
+            name='quiz_created_at_id_idx',
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='quiz',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='questions', to='quiz.quiz', verbose_name='Quiz'),
+        ),
+        migrations.AlterField(
+            model_name='quiz',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='quizzes', to=settings.AUTH_USER_MODEL, verbose_name='Author'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['quiz', 'id'], name='question_quiz_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(condition=models.Q(('verified', True)), fields=['created_at', 'id'], name='quiz_verified_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['author', 'id'], name='quiz_author_id_idx'),
+        ),
+    ]
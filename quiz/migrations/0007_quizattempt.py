@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:22
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0006_query_pattern_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempt_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True, verbose_name='Attempt ID')),
+                ('answers', models.JSONField(default=dict, verbose_name='Answers')),
+                ('reward', models.PositiveIntegerField(default=0, verbose_name='Reward (XP)')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Started At')),
+                ('finished_at', models.DateTimeField(verbose_name='Finished At')),
+                ('player', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to=settings.AUTH_USER_MODEL, verbose_name='Player')),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to='quiz.quiz', verbose_name='Quiz')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['player', 'finished_at', 'id'], name='attempt_player_finished_idx')],
+            },
+        ),
+    ]
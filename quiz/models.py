@@ -1,9 +1,25 @@
+import uuid
+
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Upper
 from account.models import Player
 
 
+class QuizQuerySet(models.QuerySet):
+    def with_author(self):
+        # Only the columns QuizSerializer renders, author included through a single join
+        return self.select_related('author').only(
+            'id', 'title', 'description', 'available_time', 'verified', 'score', 'created_at', 'updated_at',
+            'author__display_name',
+        )
+
+
 class Quiz(models.Model):
-    author = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='quizzes', verbose_name='Author')
+    author = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='quizzes', verbose_name='Author',
+                               db_index=False)
     title = models.CharField(max_length=200, verbose_name='Quiz Title')
     description = models.TextField(verbose_name='Quiz Description')
     available_time = models.DurationField(verbose_name='Available Time')
@@ -14,12 +30,35 @@ class Quiz(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Created At')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Updated At')
 
+    # Computed by PostgreSQL on every write, so saves, bulk inserts and queryset updates all keep it in sync
+    search_vector = models.GeneratedField(
+        expression=SearchVector('title', weight='A', config='english')
+        + SearchVector('description', weight='B', config='english'),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = QuizQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Catalogue: verified quizzes in (created_at, id) keyset order
+            models.Index(fields=['created_at', 'id'], name='quiz_verified_created_idx', condition=Q(verified=True)),
+            # my_quizzes: an author's quizzes in id order, also serves the author foreign key
+            models.Index(fields=['author', 'id'], name='quiz_author_id_idx'),
+            # Full-text search
+            GinIndex(fields=['search_vector'], name='quiz_search_idx'),
+            # Title autocomplete: Django compares istartswith as UPPER(title) LIKE UPPER('prefix%')
+            GinIndex(OpClass(Upper('title'), name='gin_trgm_ops'), name='quiz_title_trgm_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
 
 class Question(models.Model):
-    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='questions', verbose_name='Quiz')
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='questions', verbose_name='Quiz',
+                             db_index=False)
 
     question = models.TextField(verbose_name='Question')
 
@@ -39,6 +78,34 @@ class Question(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Created At')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Updated At')
 
+    class Meta:
+        indexes = [
+            # Questions of a quiz in id order, also serves the quiz foreign key
+            models.Index(fields=['quiz', 'id'], name='question_quiz_id_idx'),
+        ]
+
     def __str__(self):
         return self.question
 
+
+class QuizAttempt(models.Model):
+    # Generated when the game finishes, makes re-flushing a buffered batch harmless
+    attempt_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False, verbose_name='Attempt ID')
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='attempts', verbose_name='Player',
+                               db_index=False)
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='attempts', verbose_name='Quiz')
+
+    answers = models.JSONField(default=dict, verbose_name='Answers')
+    reward = models.PositiveIntegerField(default=0, verbose_name='Reward (XP)')
+
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Started At')
+    finished_at = models.DateTimeField(verbose_name='Finished At')
+
+    class Meta:
+        indexes = [
+            # A player's history, newest first, also serves the player foreign key
+            models.Index(fields=['player', 'finished_at', 'id'], name='attempt_player_finished_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.player_id} - {self.quiz_id} ({self.reward} XP)'
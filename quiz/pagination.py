@@ -0,0 +1,9 @@
+from rest_framework.pagination import CursorPagination
+
+
+class QuizCursorPagination(CursorPagination):
+    ordering = ('created_at', 'id')
+
+
+class AttemptCursorPagination(CursorPagination):
+    ordering = ('-finished_at', '-id')
@@ -0,0 +1,27 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
+
+SEARCH_CONFIG = 'english'
+# Shorter prefixes have no trigram to look up and would scan the whole title index
+AUTOCOMPLETE_MIN_LENGTH = 3
+AUTOCOMPLETE_LIMIT = 10
+
+
+def search_query(text):
+    # websearch syntax: quoted phrases, "or" and -excluded words, and never a syntax error
+    return SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+
+
+def search_quizzes(queryset, text):
+    query = search_query(text)
+    return (queryset.filter(search_vector=query)
+            .annotate(rank=SearchRank(F('search_vector'), query))
+            .order_by('-rank', 'id'))
+
+
+def autocomplete_titles(queryset, prefix, limit=AUTOCOMPLETE_LIMIT):
+    prefix = prefix.strip()
+    if len(prefix) < AUTOCOMPLETE_MIN_LENGTH:
+        return []
+    return list(queryset.filter(title__istartswith=prefix).order_by('title', 'id')
+                .values('id', 'title')[:limit])
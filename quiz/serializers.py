@@ -1,5 +1,5 @@
-from rest_framework.serializers import ModelSerializer
-from .models import Quiz, Question
+from rest_framework.serializers import Serializer, ModelSerializer, CharField, IntegerField
+from .models import Quiz, Question, QuizAttempt
 from account.models import Player
 
 
@@ -12,10 +12,35 @@ class QuizSerializer(ModelSerializer):
     author = PlayerNameSerializer(read_only=True)
     class Meta:
         model = Quiz
-        fields = '__all__'
+        exclude = ('search_vector',)
 
 
 class QuestionSerializer(ModelSerializer):
     class Meta:
         model = Question
         fields = '__all__'
+        read_only_fields = ('quiz',)
+
+
+PLAYER_QUESTION_FIELDS = ('id', 'question', 'option_a', 'option_b', 'option_c', 'option_d')
+
+
+class PlayerQuestionSerializer(Serializer):
+    id = IntegerField(read_only=True)
+    question = CharField(read_only=True)
+    option_a = CharField(read_only=True)
+    option_b = CharField(read_only=True)
+    option_c = CharField(read_only=True)
+    option_d = CharField(read_only=True)
+
+    def to_representation(self, instance):
+        # Plain attribute reads instead of DRF's per-field machinery, this runs for every question of every game
+        return {field: getattr(instance, field) for field in PLAYER_QUESTION_FIELDS}
+
+
+class QuizAttemptSerializer(ModelSerializer):
+    quiz_title = CharField(source='quiz.title', read_only=True)
+
+    class Meta:
+        model = QuizAttempt
+        fields = ('attempt_id', 'quiz', 'quiz_title', 'answers', 'reward', 'started_at', 'finished_at')
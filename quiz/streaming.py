@@ -0,0 +1,50 @@
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+STREAM_FORMATS = ('json', 'ndjson')
+
+
+def join_rows(rows, encode, head='', separator='', tail=''):
+    if head:
+        yield head
+    for index, row in enumerate(rows):
+        yield encode(row) if index == 0 else separator + encode(row)
+    if tail:
+        yield tail
+
+
+async def ajoin_rows(rows, encode, head='', separator='', tail=''):
+    if head:
+        yield head
+    index = 0
+    async for row in rows:
+        yield encode(row) if index == 0 else separator + encode(row)
+        index += 1
+    if tail:
+        yield tail
+
+
+def streaming_response(request, queryset, encode, head='', separator='', tail='', chunk_size=500, **kwargs):
+    # Rows are fetched in chunks and encoded one by one, so peak memory does not grow with the result set.
+    # Django buffers a sync iterator whole before sending it under ASGI (and an async one under WSGI), so the
+    # rows are read with the iterator matching the handler serving the request.
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        content = ajoin_rows(queryset.aiterator(chunk_size=chunk_size), encode, head, separator, tail)
+    else:
+        content = join_rows(queryset.iterator(chunk_size=chunk_size), encode, head, separator, tail)
+    return StreamingHttpResponse(content, **kwargs)
+
+
+def stream_response(request, queryset, serializer_class, stream_format, chunk_size=500):
+    serializer = serializer_class()
+    encoder = JSONEncoder()
+
+    def encode(instance):
+        return encoder.encode(serializer.to_representation(instance))
+
+    if stream_format == 'ndjson':
+        return streaming_response(request, queryset, lambda instance: encode(instance) + '\n',
+                                  chunk_size=chunk_size, content_type='application/x-ndjson')
+    return streaming_response(request, queryset, encode, '[', ',', ']', chunk_size=chunk_size,
+                              content_type='application/json')
@@ -1,3 +1,707 @@
-from django.test import TestCase
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from QuizAPP import metrics, tiered_cache
+from QuizAPP.tiered_cache import TieredCache
+from account import leaderboard
+from account.models import Player
+from account.tokens import issue_tokens
+from benchmarks import in_process
+from .models import Quiz, Question, QuizAttempt
+from .pagination import QuizCursorPagination
+from .views import GameEndView
+from .search import search_quizzes
+from . import attempts, caches, game_sessions, transfer
+
+
+class QuizQueryCountTests(APITestCase):
+    """Pins the number of queries each quiz read endpoint issues, so N+1 lookups cannot creep back in."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.player = Player.objects.create_user('09120000000', 'password', name='Player', display_name='player')
+        for index in range(5):
+            author = Player.objects.create_user(f'0913000000{index}', 'password', name='Author',
+                                                display_name=f'author{index}')
+            cls.quiz = Quiz.objects.create(author=author, title=f'Quiz {index}', description='Description',
+                                           available_time=timedelta(minutes=5), verified=True, score=100)
+            Quiz.objects.create(author=cls.player, title=f'Draft {index}', description='Description',
+                                available_time=timedelta(minutes=5))
+        Question.objects.bulk_create([
+            Question(quiz=cls.quiz, question=f'Question {index}', option_a='A', option_b='B', option_c='C',
+                     option_d='D', correct_answer='a')
+            for index in range(15)
+        ])
+
+    def setUp(self):
+        self.client.force_authenticate(self.player)
+
+    def assertQueryCount(self, url, expected):
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list(self):
+        response = self.assertQueryCount(reverse('quiz:quiz-list'), 2)
+        self.assertEqual(response.data['results'][0]['author'], {'display_name': 'author0'})
+
+    def test_retrieve(self):
+        self.assertQueryCount(reverse('quiz:quiz-detail', args=[self.quiz.pk]), 1)
+
+    def test_cursor_pagination(self):
+        for url, titles in ((reverse('quiz:quiz-list'), [f'Quiz {index}' for index in range(5)]),
+                            (reverse('quiz:quiz-get_my_quizzes', args=[self.player.pk]),
+                             [f'Draft {index}' for index in range(5)])):
+            with self.subTest(url), mock.patch.object(QuizCursorPagination, 'page_size', 2):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, {'pagination': 'cursor'})
+                self.assertFalse([query for query in queries if 'COUNT(' in query['sql']])
+                self.assertNotIn('count', response.data)
+                self.assertIsNone(response.data['previous'])
+
+                seen = [quiz['title'] for quiz in response.data['results']]
+                while response.data['next']:
+                    response = self.client.get(response.data['next'])
+                    seen += [quiz['title'] for quiz in response.data['results']]
+                self.assertEqual(seen, titles)
+
+                response = self.client.get(response.data['previous'])
+                self.assertEqual([quiz['title'] for quiz in response.data['results']], titles[2:4])
+
+    def test_conditional_retrieve(self):
+        url = reverse('quiz:quiz-detail', args=[self.quiz.pk])
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        Quiz.objects.filter(pk=self.quiz.pk).update(title='Renamed', updated_at=timezone.now())
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_conditional_list(self):
+        url = reverse('quiz:quiz-list')
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        caches.invalidate_quiz(self.quiz.pk)
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_my_quizzes(self):
+        response = self.assertQueryCount(reverse('quiz:quiz-get_my_quizzes', args=[self.player.pk]), 2)
+        self.assertEqual(response.data['count'], 5)
+
+    def test_questions(self):
+        response = self.assertQueryCount(reverse('quiz:questions', args=[self.quiz.pk]), 3)
+        self.assertEqual(response.data['count'], 15)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertNotIn('correct_answer', response.data['results'][0])
+
+    def test_questions_as_author(self):
+        self.client.force_authenticate(self.quiz.author)
+        response = self.assertQueryCount(reverse('quiz:questions', args=[self.quiz.pk]), 3)
+        self.assertEqual(response.data['results'][0]['correct_answer'], 'a')
+
+    def test_questions_stream(self):
+        response = self.client.get(reverse('quiz:questions', args=[self.quiz.pk]), {'stream': 'ndjson'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([row['question'] for row in rows], [f'Question {index}' for index in range(15)])
+
+    def test_my_quizzes_stream(self):
+        response = self.client.get(reverse('quiz:quiz-get_my_quizzes', args=[self.player.pk]), {'stream': 'json'})
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content))), 5)
+
+    async def test_streams_under_asgi(self):
+        # The rows are read asynchronously rather than buffered by Django's sync iterator fallback
+        headers = {'Authorization': f'Bearer {issue_tokens(self.player)["access"]}'}
+        response = await self.async_client.get(reverse('quiz:questions', args=[self.quiz.pk]), {'stream': 'json'},
+                                               headers=headers)
+        self.assertTrue(response.is_async)
+        rows = json.loads(b''.join([chunk async for chunk in response.streaming_content]))
+        self.assertEqual([row['question'] for row in rows], [f'Question {index}' for index in range(15)])
+
+    def test_start_with_questions(self):
+        response = self.client.post(reverse('quiz:start_quiz'), {'player_id': self.player.pk, 'quiz_id': self.quiz.pk,
+                                                                 'include_questions': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        bundle = json.loads(response.content)
+        self.assertEqual(len(bundle['questions']), 15)
+        self.assertNotIn('correct_answer', bundle['questions'][0])
+        game_sessions.finish_game(self.player.pk, self.quiz.pk)
+
+    def test_batch_question_update(self):
+        questions = list(self.quiz.questions.order_by('id'))
+        self.client.force_authenticate(self.quiz.author)
+        with self.assertNumQueries(5):
+            response = self.client.patch(reverse('quiz:questions', args=[self.quiz.pk]), {
+                'questions': [{'id': question.pk, 'correct_answer': 'b'} for question in questions],
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(self.quiz.questions.values_list('correct_answer', flat=True)), {'b'})
+        self.assertFalse(Quiz.objects.get(pk=self.quiz.pk).verified)
+
+    def test_batch_question_delete(self):
+        question_ids = list(self.quiz.questions.values_list('id', flat=True)[:10])
+        self.client.force_authenticate(self.quiz.author)
+        with self.assertNumQueries(4):
+            response = self.client.delete(reverse('quiz:questions', args=[self.quiz.pk]), {'ids': question_ids},
+                                          format='json')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.quiz.questions.count(), 5)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN output is PostgreSQL specific.')
+class QueryPlanTests(TestCase):
+    """
+    Checks that the hot quiz queries are answered by the indexes declared in Quiz.Meta and Question.Meta.
+
+    The seeded dataset is small enough for PostgreSQL to prefer sequential scans, so they are disabled for the
+    test transaction with SET LOCAL: if the plan still is not an index scan, no index matches the query.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        authors = Player.objects.bulk_create([
+            Player(phone=f'0912{index:07d}', name='Author', display_name=f'author{index}') for index in range(20)
+        ])
+        quizzes = Quiz.objects.bulk_create([
+            Quiz(author=authors[index % 20], title=f'Quiz {index}', description='Description',
+                 available_time=timedelta(minutes=5), verified=index % 2 == 0)
+            for index in range(400)
+        ])
+        Question.objects.bulk_create([
+            Question(quiz=quizzes[index % 40], question=f'Question {index}', option_a='A', option_b='B',
+                     option_c='C', option_d='D', correct_answer='a')
+            for index in range(2000)
+        ])
+        QuizAttempt.objects.bulk_create([
+            QuizAttempt(player=authors[index % 20], quiz=quizzes[index % 400], reward=index,
+                        finished_at=timezone.now() - timedelta(minutes=index))
+            for index in range(1000)
+        ])
+        cls.author = authors[0]
+        cls.quiz = quizzes[0]
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            # SSD-like random reads, otherwise the tiny, perfectly correlated table favours walking the primary key
+            cursor.execute('SET LOCAL random_page_cost = 1.1')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertRegex(plan, rf'Index (Only )?Scan (Backward )?(using|on) {index_name}\b')
+
+    def test_catalogue(self):
+        self.assertUsesIndex(Quiz.objects.filter(verified=True).order_by('created_at', 'id')[:10],
+                             'quiz_verified_created_idx')
+
+    def test_my_quizzes(self):
+        self.assertUsesIndex(Quiz.objects.filter(author_id=self.author.pk).order_by('id')[:10], 'quiz_author_id_idx')
+
+    def test_questions(self):
+        self.assertUsesIndex(Question.objects.filter(quiz_id=self.quiz.pk).order_by('id')[:10],
+                             'question_quiz_id_idx')
+
+    def test_search(self):
+        self.assertRegex(search_quizzes(Quiz.objects.filter(verified=True), '17').explain(),
+                         r'Bitmap Index Scan on quiz_search_idx\b')
+
+    def test_autocomplete(self):
+        plan = Quiz.objects.filter(verified=True, title__istartswith='Quiz 1').order_by('title', 'id')[:10].explain()
+        self.assertRegex(plan, r'Bitmap Index Scan on quiz_title_trgm_idx\b')
+
+    def test_attempt_history(self):
+        self.assertUsesIndex(QuizAttempt.objects.filter(player_id=self.author.pk).order_by('-finished_at', '-id')[:10],
+                             'attempt_player_finished_idx')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Full-text search is PostgreSQL specific.')
+class SearchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.player = Player.objects.create_user('09120000000', 'password', name='Player', display_name='player')
+        for title, description, verified in (
+            ('Ancient History', 'Empires and kings of the ancient world.', True),
+            ('World Geography', 'Rivers, mountains and the history of borders.', True),
+            ('History Drafts', 'Not reviewed yet.', False),
+        ):
+            Quiz.objects.create(author=cls.player, title=title, description=description,
+                                available_time=timedelta(minutes=5), verified=verified)
+
+    def setUp(self):
+        self.client.force_authenticate(self.player)
+
+    def test_ranks_title_matches_first(self):
+        response = self.client.get(reverse('quiz:quiz-search'), {'q': 'histories'})
+        self.assertEqual([quiz['title'] for quiz in response.data['results']], ['Ancient History', 'World Geography'])
+        self.assertNotIn('search_vector', response.data['results'][0])
+        self.assertEqual(self.client.get(reverse('quiz:quiz-search')).status_code, 400)
+
+    def test_search_vector_follows_updates(self):
+        Quiz.objects.filter(title='World Geography').update(description='Rivers and mountains.')
+        response = self.client.get(reverse('quiz:quiz-search'), {'q': 'history'})
+        self.assertEqual(response.data['count'], 1)
+
+    def test_autocomplete(self):
+        response = self.client.get(reverse('quiz:quiz-autocomplete'), {'q': 'anc'})
+        self.assertEqual([quiz['title'] for quiz in response.data['results']], ['Ancient History'])
+        self.assertEqual(self.client.get(reverse('quiz:quiz-autocomplete'), {'q': 'an'}).data['results'], [])
+
+
+class TransferTests(APITestCase):
+    def setUp(self):
+        self.player = Player.objects.create_user('09120000000', 'password', name='Player', display_name='player')
+        self.client.force_authenticate(self.player)
+        self.quiz = Quiz.objects.create(author=self.player, title='Quiz', description='Description',
+                                        available_time=timedelta(minutes=5), score=40)
+        Question.objects.bulk_create([
+            Question(quiz=self.quiz, question=f'Question,\n"{index}"', option_a='A', option_b='B', option_c='C',
+                     option_d='D', correct_answer='abcd'[index % 4])
+            for index in range(5)
+        ])
+
+    def upload(self, body, file_format, **params):
+        return self.client.post(reverse('quiz:quiz-import') + '?' + '&'.join(f'{k}={v}' for k, v in params.items()),
+                                data=body, content_type=transfer.CONTENT_TYPES[file_format])
+
+    def questions(self, quiz_id):
+        return list(Question.objects.filter(quiz_id=quiz_id).order_by('id').values_list(*transfer.QUESTION_FIELDS))
+
+    def test_round_trip(self):
+        for file_format in transfer.FORMATS:
+            with self.subTest(file_format):
+                response = self.client.get(reverse('quiz:quiz-export', args=[self.quiz.pk]), {'as': file_format})
+                body = b''.join(response.streaming_content)
+                response = self.upload(body, file_format, title='Copy', description='Copy', available_time='00:05:00')
+                self.assertEqual(response.status_code, 201, response.data)
+                self.assertEqual(response.data['questions'], 5)
+                self.assertEqual(self.questions(response.data['id']), self.questions(self.quiz.pk))
+                copy = Quiz.objects.get(pk=response.data['id'])
+                self.assertEqual(copy.available_time, timedelta(minutes=5))
+                self.assertFalse(copy.verified)
+
+    async def test_export_under_asgi(self):
+        headers = {'Authorization': f'Bearer {issue_tokens(self.player)["access"]}'}
+        for file_format in transfer.FORMATS:
+            with self.subTest(file_format):
+                response = await self.async_client.get(reverse('quiz:quiz-export', args=[self.quiz.pk]),
+                                                       {'as': file_format}, headers=headers)
+                self.assertTrue(response.is_async)
+                body = b''.join([chunk async for chunk in response.streaming_content])
+                self.assertEqual(body.decode(), ''.join(await sync_to_async(list)(
+                    transfer.export_quiz(self.quiz, file_format))))
+
+    def test_malformed_uploads(self):
+        question = {field: 'x' for field in transfer.QUESTION_FIELDS} | {'correct_answer': 'a'}
+        metadata = {'title': 'Copy', 'description': 'Copy', 'available_time': '00:05:00'}
+        for file_format, body in (
+            ('json', json.dumps([metadata])),
+            ('json', json.dumps(metadata)[:-1] + ', "questions": [' + json.dumps(question)),
+            ('json', json.dumps(metadata)[:-1] + ', "questions": {}}'),
+            ('json', json.dumps({**metadata, 'questions': [question], 'score': 5})),
+            ('json', json.dumps({**metadata, 'questions': [question, None]})),
+            ('json', json.dumps({**metadata, 'questions': []}) + '{}'),
+            ('ndjson', '[1, 2]\n'),
+            ('ndjson', json.dumps(metadata) + '\n' + json.dumps(question) + '\n{"question": \n'),
+            ('ndjson', json.dumps(metadata) + '\n' + '"question"\n'),
+            ('csv', 'question,option_a\nx,y\n'),
+            ('csv', ','.join(transfer.QUESTION_FIELDS) + '\n"' + 'x' * 200000 + '",b,c,d,e,a\n'),
+            ('csv', ','.join(transfer.QUESTION_FIELDS) + '\nx,a,b,c,d,e\n'),
+        ):
+            with self.subTest(file_format, body=body[:80]):
+                response = self.upload(body.encode(), file_format, title='Copy', description='Copy', available_time='00:05:00')
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(Quiz.objects.count(), 1)
+
+    def test_empty_upload(self):
+        response = self.upload(b'', 'json', title='Copy', description='Copy', available_time='00:05:00')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('empty', response.data['error'])
+
+    def test_malformed_value_is_not_buffered(self):
+        # An unterminated string would otherwise be re-read with every chunk until the end of the upload
+        stream = io.BytesIO(b'{"title": "' + b'x' * (4 * transfer.CHUNK_SIZE))
+        reader = transfer.JSONReader(stream, max_value_size=transfer.CHUNK_SIZE)
+        reader.expect('{')
+        self.assertEqual(reader.value(), 'title')
+        reader.expect(':')
+        with self.assertRaises(ValueError):
+            reader.value()
+        self.assertLess(stream.tell(), 3 * transfer.CHUNK_SIZE)
+
+    def test_json_is_read_in_chunks(self):
+        questions = [{field: f'{field} {index} é' for field in transfer.QUESTION_FIELDS} for index in range(50)]
+        body = json.dumps({'title': 'Quiz', 'score': 1234567, 'questions': questions}, ensure_ascii=False, indent=1)
+        metadata, rows = transfer.read_json(io.BufferedReader(io.BytesIO(body.encode()), buffer_size=7))
+        self.assertEqual(metadata, {'title': 'Quiz', 'score': 1234567})
+        self.assertEqual(list(rows), questions)
+
+
+class AttemptHistoryTests(APITestCase):
+    def setUp(self):
+        self.player = Player.objects.create_user('09120000000', 'password', name='Player', display_name='player')
+        self.quiz = Quiz.objects.create(author=self.player, title='Quiz', description='Description',
+                                        available_time=timedelta(minutes=5), verified=True, score=100)
+        self.question = Question.objects.create(quiz=self.quiz, question='Question', option_a='A', option_b='B',
+                                                option_c='C', option_d='D', correct_answer='a')
+        self.client.force_authenticate(self.player)
+        attempts.get_connection().delete(attempts.BUFFER_KEY, attempts.FLUSHING_KEY, attempts.LOCK_KEY)
+        caches.get_answer_key(self.quiz.pk)
+        leaderboard.sync(self.player)
+
+    def play(self, answer):
+        game = {'player_id': self.player.pk, 'quiz_id': self.quiz.pk}
+        self.client.post(reverse('quiz:start_quiz'), game, format='json')
+        # Only the score update, the attempt is buffered
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('quiz:finish_quiz'),
+                                        {**game, 'answers': {str(self.question.pk): answer}}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_finished_games_are_flushed_in_batches(self):
+        self.play('a')
+        self.play('b')
+        self.assertFalse(QuizAttempt.objects.exists())
+        self.assertEqual(attempts.pending(), 2)
+
+        self.assertEqual(attempts.flush(), 2)
+        self.assertEqual(attempts.pending(), 0)
+
+        response = self.client.get(reverse('quiz:history', args=[self.player.pk]))
+        results = response.data['results']
+        self.assertEqual([attempt['reward'] for attempt in results], [0, 100])
+        self.assertEqual(results[1]['answers'], {str(self.question.pk): 'a'})
+        self.assertEqual(results[1]['quiz_title'], 'Quiz')
+        self.assertIsNotNone(results[1]['started_at'])
+
+    def test_reflushing_a_batch_is_harmless(self):
+        self.play('a')
+        item = attempts.get_connection().lindex(attempts.BUFFER_KEY, 0)
+        attempts.flush()
+        # A flush that crashed after inserting leaves its batch behind
+        attempts.get_connection().rpush(attempts.FLUSHING_KEY, item)
+        attempts.flush()
+        self.assertEqual(QuizAttempt.objects.count(), 1)
+
+    def test_concurrent_flushes(self):
+        for answer in 'abcd':
+            self.play(answer)
+        build_attempts = attempts._build_attempts
+        nested = []
+
+        def build_during_second_flush(items):
+            # A second worker flushing while the first is between LRANGE and LTRIM
+            if not nested:
+                nested.append(attempts.flush(batch_size=2))
+            return build_attempts(items)
+
+        with mock.patch.object(attempts, '_build_attempts', side_effect=build_during_second_flush):
+            self.assertEqual(attempts.flush(batch_size=2), 4)
+        self.assertEqual(nested, [0])
+        self.assertEqual(QuizAttempt.objects.count(), 4)
+        self.assertEqual(attempts.pending(), 0)
+
+    def test_cannot_play_as_another_player(self):
+        other = Player.objects.create_user('09120000001', 'password', name='Other', display_name='other')
+        game = {'player_id': other.pk, 'quiz_id': self.quiz.pk}
+        self.assertEqual(self.client.post(reverse('quiz:start_quiz'), game, format='json').status_code, 403)
+        self.assertEqual(self.client.post(reverse('quiz:finish_quiz'), {**game, 'player_id': 'abc'},
+                                          format='json').status_code, 403)
+
+    def test_rejected_finish_keeps_the_game(self):
+        game = {'quiz_id': self.quiz.pk}
+        self.client.post(reverse('quiz:start_quiz'), game, format='json')
+        for data in ({**game, 'answers': ['a']}, {'quiz_id': 'x'}):
+            response = self.client.post(reverse('quiz:finish_quiz'), data, format='json')
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(reverse('quiz:start_quiz')).data['active_quizzes'], [self.quiz.pk])
+
+        # A player deleted while their access token is still valid
+        self.client.force_authenticate(Player(pk=self.player.pk + 100))
+        self.client.post(reverse('quiz:start_quiz'), game, format='json')
+        self.assertEqual(self.client.post(reverse('quiz:finish_quiz'), game, format='json').status_code, 404)
+        self.assertEqual(self.client.get(reverse('quiz:start_quiz')).data['active_quizzes'], [self.quiz.pk])
+        session = game_sessions.finish_game(self.player.pk + 100, self.quiz.pk)
+        self.assertEqual(session.score, 100)
+        self.assertAlmostEqual(session.expires_at, session.started_at + 300, delta=5)
+
+    def test_active_games_are_your_own(self):
+        other = Player.objects.create_user('09120000001', 'password', name='Other', display_name='other')
+        game_sessions.start_game(other.pk, self.quiz)
+        response = self.client.get(reverse('quiz:start_quiz'), {'player_id': other.pk})
+        self.assertEqual(response.data['active_quizzes'], [])
+
+    def test_history_of_another_player(self):
+        other = Player.objects.create_user('09120000001', 'password', name='Other', display_name='other')
+        self.assertEqual(self.client.get(reverse('quiz:history', args=[other.pk])).status_code, 403)
+
+
+class AsyncGameplayTests(TestCase):
+    def setUp(self):
+        self.player = Player.objects.create_user('09120000000', 'password', name='Player', display_name='player')
+        self.quiz = Quiz.objects.create(author=self.player, title='Quiz', description='Description',
+                                        available_time=timedelta(minutes=5), verified=True, score=100)
+        self.questions = [
+            Question.objects.create(quiz=self.quiz, question=f'Question {index}', option_a='A', option_b='B',
+                                    option_c='C', option_d='D', correct_answer='a')
+            for index in range(2)
+        ]
+        attempts.get_connection().delete(attempts.BUFFER_KEY, attempts.FLUSHING_KEY, attempts.LOCK_KEY)
+        leaderboard.sync(self.player)
+        self.tokens = issue_tokens(self.player)
+
+    def post(self, name, data, token=None):
+        headers = {'Authorization': f'Bearer {token or self.tokens["access"]}'}
+        return self.async_client.post(reverse(f'quiz:{name}'), data, content_type='application/json',
+                                      headers=headers)
+
+    async def test_token_required(self):
+        url = reverse('quiz:async_start_quiz')
+        response = await self.async_client.post(url, {'quiz_id': self.quiz.pk}, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+
+        for token in ('invalid', self.tokens['refresh']):
+            response = await self.post('async_start_quiz', {'quiz_id': self.quiz.pk}, token=token)
+            self.assertEqual(response.status_code, 401)
+        self.assertEqual(game_sessions.active_quizzes(self.player.pk), [])
+
+    async def test_invalid_body(self):
+        response = await self.post('async_start_quiz', '[1]')
+        self.assertEqual(response.status_code, 400)
+        response = await self.post('async_finish_quiz', {'quiz_id': self.quiz.pk, 'answers': ['a']})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'start_quiz': '1/min'}})
+    async def test_throttled(self):
+        response = await self.post('async_start_quiz', {'quiz_id': self.quiz.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response['X-RateLimit-Limit'], response['X-RateLimit-Remaining']), ('1', '0'))
+
+        response = await self.post('async_start_quiz', {'quiz_id': self.quiz.pk})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['X-RateLimit-Remaining'], '0')
+        self.assertTrue(0 < int(response['Retry-After']) <= 60)
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'start_quiz': '1/min'}})
+    def test_players_have_their_own_buckets(self):
+        # The sync view draws from the same bucket, and another player from the same address has their own
+        other = Player.objects.create_user('09120000001', 'password', name='Other', display_name='other')
+        self.client.force_login(self.player)
+        self.assertEqual(self.client.post(reverse('quiz:start_quiz'), {'quiz_id': self.quiz.pk},
+                                          content_type='application/json').status_code, 200)
+        response = async_to_sync(self.post)('async_start_quiz', {'quiz_id': self.quiz.pk})
+        self.assertEqual(response.status_code, 429)
+
+        response = async_to_sync(self.post)('async_start_quiz', {'quiz_id': self.quiz.pk},
+                                            token=issue_tokens(other)['access'])
+        self.assertEqual(response.status_code, 200)
+
+    async def test_include_questions(self):
+        response = await self.post('async_start_quiz', {'quiz_id': self.quiz.pk, 'include_questions': True})
+        self.assertEqual(response.status_code, 200)
+        bundle = json.loads(response.content)
+        self.assertEqual([question['id'] for question in bundle['questions']],
+                         [question.pk for question in self.questions])
+        self.assertNotIn('correct_answer', bundle['questions'][0])
+
+    async def test_start_and_finish(self):
+        self.assertEqual((await self.post('async_start_quiz', {'quiz_id': self.quiz.pk})).status_code, 200)
+        self.assertEqual((await self.post('async_start_quiz', {'quiz_id': self.quiz.pk})).status_code, 403)
+
+        answers = {str(self.questions[0].pk): 'a', str(self.questions[1].pk): 'b'}
+        response = await self.post('async_finish_quiz', {'quiz_id': self.quiz.pk, 'answers': answers})
+        self.assertEqual((response.status_code, json.loads(response.content)), (200, {'score': 50}))
+        self.assertEqual((await Player.objects.aget(pk=self.player.pk)).score, 50)
+        self.assertEqual(leaderboard.get_score(self.player.pk), 50)
+        self.assertEqual(attempts.pending(), 1)
+
+        response = await self.post('async_finish_quiz', {'quiz_id': self.quiz.pk, 'answers': answers})
+        self.assertEqual(response.status_code, 400)
+
+
+class RewardTests(TestCase):
+    answer_key = {1: 'a', 2: 'b', 3: 'c', 4: 'd'}
+
+    def reward(self, answers):
+        return GameEndView().calculate_reward(answers, self.answer_key, 100)
+
+    def test_correct_answers(self):
+        self.assertEqual(self.reward({'1': 'a', '2': 'b', '3': 'a'}), 50)
+
+    def test_unknown_questions_and_null_answers(self):
+        answers = {str(question_id): None for question_id in range(5, 500)}
+        answers.update({'1': 'a', '01': 'a', '001': 'a', 'x': 'a', '2': None})
+        self.assertEqual(self.reward(answers), 25)
+        self.assertEqual(self.reward(['a', 'b']), 0)
+
+
+class TieredCacheTests(TestCase):
+    def worker_cache(self, new_process=True):
+        # Dropping the process-wide state makes the next instance stand in for another worker process
+        params = settings.CACHES['tiered']
+        params = {**params, 'OPTIONS': {**params['OPTIONS'], 'INVALIDATION_CHANNEL': f'test:{self.id()}'}}
+        if new_process:
+            tiered_cache._states.pop(tiered_cache.state_key(params['LOCATION'], params), None)
+        return TieredCache(params['LOCATION'], params)
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 2
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_invalidation_reaches_other_processes(self):
+        first, second = self.worker_cache(), self.worker_cache()
+        first.set('tiered:test', {'a': 1})
+        self.assertEqual(second.get('tiered:test'), {'a': 1})
+        self.wait_for(lambda: second.state.subscriber.is_alive() and second.get('tiered:test') is not None
+                      and second.state.counters['local_hits'] > 0)
+
+        first.set('tiered:test', {'a': 2})
+        self.wait_for(lambda: second.get('tiered:test') == {'a': 2})
+        first.incr('tiered:counter', ignore_key_check=True)
+        self.assertEqual(second.get('tiered:counter'), 1)
+        first.incr('tiered:counter')
+        self.wait_for(lambda: second.get('tiered:counter') == 2)
+
+        stats = second.stats()
+        self.assertGreater(stats['local']['hits'], 0)
+        self.assertEqual(stats['redis']['misses'], 0)
+        first.delete_many(['tiered:test', 'tiered:counter'])
+
+    def test_threads_share_the_process_state(self):
+        cache = self.worker_cache()
+        cache.set('tiered:test', {'a': 1})
+        self.wait_for(lambda: cache.get('tiered:test') is not None and cache.state.subscriber.is_alive()
+                      and cache.state.counters['local_hits'] > 0)
+        local_hits = cache.state.counters['local_hits']
+
+        result = {}
+
+        def read():
+            # Django hands every thread its own backend instance
+            other = self.worker_cache(new_process=False)
+            result['value'] = other.get('tiered:test')
+            result['state'] = other.state
+
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join()
+        self.assertIs(result['state'], cache.state)
+        self.assertEqual(result['value'], {'a': 1})
+        self.assertEqual(cache.stats()['local']['hits'], local_hits + 1)
+        self.assertEqual(len([thread for thread in threading.enumerate() if thread.name == 'test:' + self.id()
+                              + ' listener']), 1)
+        cache.delete('tiered:test')
+
+    def test_cached_values_cannot_be_mutated(self):
+        cache = self.worker_cache()
+        cache.set('tiered:test', {'a': 1})
+        cache.get('tiered:test')
+        cache.get('tiered:test')['a'] = 2
+        self.assertEqual(cache.get('tiered:test'), {'a': 1})
+        cache.delete('tiered:test')
+
+
+class BenchmarkSeedTests(TestCase):
+    def test_seed_appends_players(self):
+        self.assertEqual(in_process.seed(players=3, quizzes=2, questions=4), 2)
+        in_process.seed(players=2, quizzes=0, questions=0)
+
+        phones = list(Player.objects.filter(name=in_process.PLAYER_NAME).order_by('phone')
+                      .values_list('phone', flat=True))
+        self.assertEqual(len(set(phones)), 5)
+        self.assertTrue(Player.objects.get(phone=phones[0]).check_password(in_process.PASSWORD))
+        self.assertEqual(Question.objects.filter(quiz__title__startswith=in_process.QUIZ_TITLE).count(), 8)
+        self.assertFalse(Quiz.objects.filter(title__startswith=in_process.QUIZ_TITLE, verified=False).exists())
+
+
+@skipUnless(connection.vendor == 'postgresql' and settings.DATABASES['default'].get('OPTIONS', {}).get('pool'),
+            'Needs the PostgreSQL connection pool.')
+class ConnectionPoolTests(TransactionTestCase):
+    def setUp(self):
+        player = Player.objects.create_user('09120000000', 'password', name='Player', display_name='player')
+        Quiz.objects.create(author=player, title='Quiz', description='Description',
+                            available_time=timedelta(minutes=5), verified=True)
+
+    def test_dead_connections_are_not_handed_out(self):
+        pool = connection.pool
+        connection.close()
+        dead, other = pool.getconn(), pool.getconn()
+        other.execute('SELECT pg_terminate_backend(%s)', [dead.info.backend_pid])
+        pool.putconn(dead)
+        pool.putconn(other)
+
+        # CONN_HEALTH_CHECKS makes Django give the pool a check, so the dead connection is replaced on checkout
+        for _ in range(pool.get_stats()['pool_size']):
+            self.assertEqual(Quiz.objects.filter(verified=True).count(), 1)
+            connection.close()
+        self.assertEqual(pool.get_stats()['connections_lost'], 1)
+
+    def test_concurrent_load(self):
+        pool = connection.pool
+        workers = pool.max_size * 3
+
+        def requests(_):
+            # Each iteration stands for a request, which gives its connection back when it finishes
+            for _ in range(10):
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_sleep(0.005)')
+                list(Quiz.objects.filter(verified=True).select_related('author'))
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(requests, range(workers)))
+
+        stats = pool.get_stats()
+        self.assertLessEqual(stats['pool_size'], pool.max_size)
+        self.assertGreater(stats.get('requests_queued', 0), 0)
+        self.assertEqual(stats.get('requests_errors', 0), 0)
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_SERVER_TIMING=True, METRICS_TOKEN='secret')
+class MetricsMiddlewareTests(APITestCase):
+    def setUp(self):
+        metrics.registry.reset()
+        self.player = Player.objects.create_user('09120000000', 'password', name='Player', display_name='player')
+        self.client.force_authenticate(self.player)
+
+    def test_records_view_metrics(self):
+        response = self.client.get(reverse('quiz:quiz-list'))
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="\d+ queries"')
+
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+        body = response.content.decode()
+        self.assertIn('quizapp_http_requests_total{view="quiz:quiz-list",method="GET",status="200"} 1', body)
+        self.assertIn('quizapp_db_queries_total{view="quiz:quiz-list"} 1', body)
+        self.assertIn('quizapp_cache_tier_lookups_total{alias="tiered",tier="local",result="hit"}', body)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('quiz:quiz-list'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
@@ -0,0 +1,235 @@
+import codecs
+import csv
+import io
+import json
+from typing import Callable, NamedTuple
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils.duration import duration_string
+from rest_framework.exceptions import ValidationError
+
+from .models import Question
+from .serializers import QuizSerializer
+from .streaming import join_rows
+
+QUESTION_FIELDS = ('question', 'option_a', 'option_b', 'option_c', 'option_d', 'correct_answer')
+OPTION_FIELDS = ('option_a', 'option_b', 'option_c', 'option_d')
+FORMATS = ('json', 'ndjson', 'csv')
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+# Largest single JSON value (the metadata or one question) read before an upload is rejected
+MAX_VALUE_SIZE = 1024 * 1024
+
+
+def format_for_content_type(content_type):
+    for file_format, format_content_type in CONTENT_TYPES.items():
+        if content_type.startswith(format_content_type):
+            return file_format
+    return None
+
+
+class JSONReader:
+    """Reads a JSON document from a byte or text stream one value at a time."""
+
+    def __init__(self, stream, chunk_size=CHUNK_SIZE, max_value_size=MAX_VALUE_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.max_value_size = max_value_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+
+    def fill(self):
+        chunk = self.stream.read(self.chunk_size)
+        self.eof = not chunk
+        if not isinstance(chunk, str):
+            chunk = self.decoder.decode(chunk, final=self.eof)
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+
+    def peek(self):
+        # The next character that is not whitespace, or '' at the end of the stream
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in ' \t\r\n':
+                self.position += 1
+            if self.position < len(self.buffer) or self.eof:
+                return self.buffer[self.position:self.position + 1]
+            self.fill()
+
+    def expect(self, characters):
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError(f'Expected {" or ".join(characters)}, found {character or "the end of the file"}.')
+        self.position += 1
+        return character
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                # A value is read again with every chunk until it is complete, so a malformed one must not
+                # pull in the rest of the upload
+                if len(self.buffer) - self.position > self.max_value_size:
+                    raise ValueError(f'A value is larger than {self.max_value_size} bytes or malformed.')
+                self.fill()
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and not self.eof:
+                self.fill()
+                continue
+            self.position = end
+            return value
+
+
+def read_json(stream):
+    # Everything before "questions" is the quiz metadata, the questions are then read one by one, so they have to
+    # be the last key (export_quiz writes them that way).
+    reader = JSONReader(stream)
+    reader.expect('{')
+    metadata = {}
+    if reader.peek() == '}':
+        reader.position += 1
+        return metadata, json_questions(reader, None)
+    while True:
+        key = reader.value()
+        if not isinstance(key, str):
+            raise ValueError('Expected a key.')
+        reader.expect(':')
+        if key == 'questions':
+            return metadata, json_questions(reader, '[')
+        metadata[key] = reader.value()
+        if reader.expect(',}') == '}':
+            return metadata, json_questions(reader, None)
+
+
+def json_questions(reader, start):
+    if start:
+        reader.expect(start)
+        if reader.peek() == ']':
+            reader.position += 1
+        else:
+            while True:
+                yield reader.value()
+                if reader.expect(',]') == ']':
+                    break
+        if reader.expect(',}') == ',':
+            raise ValueError('questions has to be the last key of the quiz.')
+    if reader.peek():
+        raise ValueError('Unexpected data after the quiz.')
+
+
+def read_quiz(stream, file_format, metadata=None):
+    # Returns the quiz metadata and a lazy iterator over its question rows. NDJSON carries the metadata
+    # on its first line and CSV only has questions, so its metadata has to be passed in.
+    try:
+        if file_format == 'json':
+            metadata, rows = read_json(stream)
+        elif file_format == 'ndjson':
+            lines = (line.decode('utf-8') if isinstance(line, bytes) else line for line in stream)
+            rows = (json.loads(line) for line in lines if line.strip())
+            metadata = next(rows, {})
+        elif file_format == 'csv':
+            lines = (line.decode('utf-8') if isinstance(line, bytes) else line for line in stream)
+            metadata, rows = metadata or {}, csv.DictReader(lines)
+        else:
+            raise ValidationError({'format': f'Unsupported format, use one of {", ".join(FORMATS)}.'})
+    except (ValueError, csv.Error) as e:
+        raise ValidationError({'file': f'Could not parse {file_format}: {e}'})
+    if not isinstance(metadata, dict):
+        raise ValidationError({'file': 'Expected the quiz as an object.'})
+    return metadata, rows
+
+
+def clean_question(row, number):
+    if not isinstance(row, dict):
+        raise ValidationError({f'question {number}': 'Expected an object.'})
+
+    question = {field: str(row.get(field) or '').strip() for field in QUESTION_FIELDS}
+    missing = [field for field, value in question.items() if not value]
+    if missing:
+        raise ValidationError({f'question {number}': f'Missing {", ".join(missing)}.'})
+    question['correct_answer'] = question['correct_answer'].lower()
+    if question['correct_answer'] not in Question.CorrectAnswers.values:
+        raise ValidationError({f'question {number}': 'correct_answer must be one of a, b, c or d.'})
+    for field in OPTION_FIELDS:
+        if len(question[field]) > Question._meta.get_field(field).max_length:
+            raise ValidationError({f'question {number}': f'{field} is too long.'})
+    return question
+
+
+def import_quiz(author_id, metadata, rows, batch_size=BATCH_SIZE):
+    serializer = QuizSerializer(data=metadata)
+    serializer.is_valid(raise_exception=True)
+
+    with transaction.atomic():
+        quiz = serializer.save(author_id=author_id, verified=False)
+        imported = 0
+        batch = []
+        try:
+            for number, row in enumerate(rows, start=1):
+                batch.append(Question(quiz=quiz, **clean_question(row, number)))
+                if len(batch) >= batch_size:
+                    Question.objects.bulk_create(batch)
+                    imported += len(batch)
+                    batch = []
+        except (ValueError, csv.Error) as e:
+            raise ValidationError({'file': f'Could not parse question {imported + len(batch) + 1}: {e}'})
+        if batch:
+            Question.objects.bulk_create(batch)
+            imported += len(batch)
+    return quiz, imported
+
+
+class Export(NamedTuple):
+    questions: QuerySet
+    encode: Callable
+    head: str
+    separator: str
+    tail: str
+
+
+def export_layout(quiz, file_format):
+    # The questions of an export and how each is written, shared by the streamed download and the command
+    metadata = {
+        'title': quiz.title,
+        'description': quiz.description,
+        'available_time': duration_string(quiz.available_time),
+        'score': quiz.score,
+    }
+    questions = Question.objects.filter(quiz_id=quiz.pk).order_by('id').values(*QUESTION_FIELDS)
+
+    if file_format == 'ndjson':
+        return Export(questions, lambda question: json.dumps(question) + '\n', json.dumps(metadata) + '\n', '', '')
+    if file_format == 'json':
+        return Export(questions, json.dumps, json.dumps(metadata)[:-1] + ', "questions": [', ', ', ']}')
+    if file_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=QUESTION_FIELDS)
+        writer.writeheader()
+        header = buffer.getvalue()
+
+        def encode(question):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerow(question)
+            return buffer.getvalue()
+        return Export(questions, encode, header, '', '')
+    raise ValidationError({'format': f'Unsupported format, use one of {", ".join(FORMATS)}.'})
+
+
+def export_quiz(quiz, file_format, batch_size=BATCH_SIZE):
+    # Yields text chunks, questions are read with a server-side iterator so any quiz size streams in bounded memory
+    questions, encode, head, separator, tail = export_layout(quiz, file_format)
+    return join_rows(questions.iterator(chunk_size=batch_size), encode, head, separator, tail)
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 
 
 app_name = 'quiz'
@@ -11,7 +11,12 @@ router.register('', views.QuizViewSet)
 
 urlpatterns = [
     path('<int:quiz>/questions/', views.QuestionView.as_view(), name='questions'),
+    path('<int:quiz>/bundle/', views.QuizBundleView.as_view(), name='bundle'),
     path('start_quiz/', views.GameStarterView.as_view(), name='start_quiz'),
     path('finish_quiz/', views.GameEndView.as_view(), name='finish_quiz'),
+    path('history/<int:player>/', views.AttemptHistoryView.as_view(), name='history'),
+    path('async/<int:quiz>/bundle/', async_views.quiz_bundle, name='async_bundle'),
+    path('async/start_quiz/', async_views.start_quiz, name='async_start_quiz'),
+    path('async/finish_quiz/', async_views.finish_quiz, name='async_finish_quiz'),
     path('', include(router.urls)),
 ]
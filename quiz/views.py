@@ -1,37 +1,133 @@
+from django.db import transaction
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.generics import ListAPIView
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.decorators import action
-from .models import Quiz, Question
-from .serializers import QuizSerializer, QuestionSerializer
+from rest_framework.settings import api_settings
+from .models import Quiz, Question, QuizAttempt
+from .serializers import (QuizSerializer, QuestionSerializer, PlayerQuestionSerializer, QuizAttemptSerializer,
+                          PLAYER_QUESTION_FIELDS)
 from .permissions import IsOwnerOrAdmin, IsQuizOwnerOrAdmin
+from .pagination import QuizCursorPagination, AttemptCursorPagination
+from .streaming import STREAM_FORMATS, stream_response, streaming_response
 from rest_framework.views import APIView
-from django.core.cache import cache
+from QuizAPP.conditional import make_etag, not_modified, set_validators
+from QuizAPP.throttling import TokenBucketThrottle
 from account.models import Player
+from account.services import credit_score
+from .search import autocomplete_titles, search_quizzes
+from . import attempts, caches, game_sessions, transfer
+
+
+# Seconds a client may reuse a catalogue page without asking again
+CATALOGUE_MAX_AGE = 30
 
 
 class QuizViewSet(ModelViewSet):
     serializer_class = QuizSerializer
-    queryset = Quiz.objects.filter(verified=True)
+    queryset = Quiz.objects.filter(verified=True).with_author()
 
     @action(detail=True, methods=['get'], url_name='get_my_quizzes', url_path='my_quizzes')
     def my_quizzes(self, request, pk=None):
-        quizzes = Quiz.objects.filter(author_id=pk)
-        serializer = self.get_serializer(quizzes, many=True)
-        return Response(serializer.data)
-
+        quizzes = Quiz.objects.filter(author_id=pk).with_author().order_by('id')
+        stream_format = request.query_params.get('stream')
+        if stream_format in STREAM_FORMATS:
+            return stream_response(request, quizzes, self.get_serializer_class(), stream_format)
+
+        return self.paginated_response(request, quizzes)
+
+
+    @action(detail=False, methods=['post'], url_name='import', url_path='import')
+    def import_quiz(self, request):
+        # The body is read straight from the request stream so large NDJSON/CSV uploads are never buffered whole
+        file_format = request.query_params.get('as') or transfer.format_for_content_type(request.content_type)
+        metadata = {field: request.query_params[field] for field in ('title', 'description', 'available_time', 'score')
+                    if field in request.query_params}
+        if request.stream is None:
+            # DRF has no stream for an empty body, nor for one sent without a Content-Length
+            return Response({'error': 'The request body is empty, send the file with a Content-Length.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        metadata, rows = transfer.read_quiz(request.stream, file_format, metadata)
+        quiz, imported = transfer.import_quiz(request.user.pk, metadata, rows)
+        return Response({'id': quiz.pk, 'questions': imported}, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'], url_name='export', url_path='export')
+    def export_quiz(self, request, pk=None):
+        quiz = Quiz.objects.filter(pk=pk).first()
+        if quiz is None:
+            return Response({'error': 'Quiz not found.'}, status=status.HTTP_404_NOT_FOUND)
+        if quiz.author_id != request.user.pk and not request.user.is_superuser:
+            raise PermissionDenied('Only the author can export a quiz.')
+
+        file_format = request.query_params.get('as', 'ndjson')
+        if file_format not in transfer.FORMATS:
+            return Response({'error': f'Unsupported format, use one of {", ".join(transfer.FORMATS)}.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        response = streaming_response(request, *transfer.export_layout(quiz, file_format),
+                                      chunk_size=transfer.BATCH_SIZE, content_type=transfer.CONTENT_TYPES[file_format])
+        response['Content-Disposition'] = f'attachment; filename="quiz-{quiz.pk}.{file_format}"'
+        return response
+
+    @action(detail=False, methods=['get'], url_name='search', url_path='search')
+    def search(self, request):
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({'error': 'The q parameter is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        def build():
+            page = self.paginate_queryset(search_quizzes(self.get_queryset(), text))
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return self.catalogue_response(request, build)
+
+    @action(detail=False, methods=['get'], url_name='autocomplete', url_path='autocomplete')
+    def autocomplete(self, request):
+        prefix = request.query_params.get('q', '')
+        return self.catalogue_response(
+            request, lambda: Response({'results': autocomplete_titles(Quiz.objects.filter(verified=True), prefix)}))
+
+    def list(self, request, *args, **kwargs):
+        return self.catalogue_response(
+            request, lambda: self.paginated_response(request, self.filter_queryset(self.get_queryset())))
+
+    def paginated_response(self, request, queryset):
+        # ?pagination=cursor switches to keyset pagination, which never counts the table
+        if request.query_params.get('pagination') == 'cursor':
+            paginator = QuizCursorPagination()
+        else:
+            paginator = self.pagination_class()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    def catalogue_response(self, request, build):
+        # The catalogue version changes whenever a quiz or its author does, so a client holding a current
+        # page is answered from a single cache read
+        etag = make_etag('catalogue', caches.get_catalogue_version(), request.get_full_path())
+        response = not_modified(request, etag)
+        if response is None:
+            response = set_validators(build(), etag, max_age=CATALOGUE_MAX_AGE)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        quiz = self.get_object()
+        etag = make_etag('quiz', quiz.pk, quiz.updated_at.isoformat(), quiz.author.display_name)
+        response = not_modified(request, etag, quiz.updated_at)
+        if response is None:
+            response = set_validators(Response(self.get_serializer(quiz).data), etag, quiz.updated_at)
+        return response
 
     def get_queryset(self):
         if self.action == 'retrieve' or self.action == 'destroy':
-            return Quiz.objects.all()
+            return Quiz.objects.with_author()
         return self.queryset
 
-
     def get_permissions(self, *args, **kwargs):
-        if self.action in ['list', 'create', 'retrieve']:
+        if self.action in ['list', 'create', 'retrieve', 'search', 'autocomplete', 'import_quiz', 'export_quiz']:
             return [IsAuthenticated()]
         elif self.action in ['update', 'partial_update', 'destroy']:
             return [IsOwnerOrAdmin()]
@@ -39,31 +135,52 @@ class QuizViewSet(ModelViewSet):
         return super().get_permissions()
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        serializer.save(author_id=self.request.user.pk)
 
     def perform_update(self, serializer):
         instance = serializer.save()
         instance.verified = False
         instance.save()
+        caches.invalidate_quiz(instance.pk)
+
+    def perform_destroy(self, instance):
+        quiz_id = instance.pk
+        instance.delete()
+        caches.invalidate_quiz(quiz_id)
 
 
 class QuestionView(APIView):
     queryset = Question.objects.all()
     serializer_class = QuestionSerializer
     permission_classes = [IsQuizOwnerOrAdmin]
+    pagination_class = api_settings.DEFAULT_PAGINATION_CLASS
 
     def get(self, request, *args, **kwargs):
         quiz_id = kwargs.get('quiz')
         try:
+            quiz = Quiz.objects.only('author_id').get(pk=quiz_id)
+            is_author = quiz.author_id == request.user.pk or request.user.is_superuser
+            serializer_class = QuestionSerializer if is_author else PlayerQuestionSerializer
+            questions = Question.objects.filter(quiz_id=quiz.pk).order_by('id')
+            if not is_author:
+                questions = questions.only(*PLAYER_QUESTION_FIELDS)
+
             if 'id' in request.data:
-                question = Question.objects.get(id=request.data['id'])
-                serializer = QuestionSerializer(question)
-            else:
-                questions = Quiz.objects.get(pk=quiz_id).questions.all()
-                serializer = QuestionSerializer(questions, many=True)
-            return Response(serializer.data)
+                serializer = serializer_class(questions.get(pk=request.data['id']))
+                return Response(serializer.data)
+
+            stream_format = request.query_params.get('stream')
+            if stream_format in STREAM_FORMATS:
+                return stream_response(request, questions, serializer_class, stream_format)
+
+            paginator = self.pagination_class()
+            page = paginator.paginate_queryset(questions, request, view=self)
+            serializer = serializer_class(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
         except Quiz.DoesNotExist:
             return Response({"detail": "Quiz not found."}, status=status.HTTP_404_NOT_FOUND)
+        except Question.DoesNotExist:
+            return Response({"detail": "Question not found."}, status=status.HTTP_404_NOT_FOUND)
 
     def post(self, request, *args, **kwargs):
         quiz_id = kwargs.get('quiz')
@@ -73,6 +190,7 @@ class QuestionView(APIView):
             serializer = QuestionSerializer(data=request.data)
             if serializer.is_valid():
                 serializer.save(quiz=quiz)
+                caches.invalidate_quiz(quiz.pk)
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         except Quiz.DoesNotExist:
@@ -80,17 +198,46 @@ class QuestionView(APIView):
 
     def patch(self, request, *args, **kwargs):
         quiz_id = kwargs.get('quiz')
-        question_id = request.data.get('id')
+        # Either a single question ({"id": ..., fields}) or a batch ({"questions": [{"id": ..., fields}, ...]})
+        many = 'questions' in request.data
+        patches = request.data['questions'] if many else [request.data]
+        if not isinstance(patches, list) or not all(isinstance(patch, dict) for patch in patches):
+            return Response({"detail": "Expected a list of question objects."}, status=status.HTTP_400_BAD_REQUEST)
+        question_ids = _parse_ids([patch.get('id') for patch in patches])
+        if question_ids is None:
+            return Response({"detail": "Invalid question id."}, status=status.HTTP_400_BAD_REQUEST)
+
         try:
-            quiz = Quiz.objects.get(pk=quiz_id)
-            question = quiz.questions.get(pk=question_id)
-            serializer = QuestionSerializer(question, data=request.data, partial=True)
-            if serializer.is_valid():
-                serializer.save()
-                quiz.verified = False
-                quiz.save()
-                return Response(serializer.data)
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            with transaction.atomic():
+                now = timezone.now()
+                if not Quiz.objects.filter(pk=quiz_id).update(verified=False, updated_at=now):
+                    raise Quiz.DoesNotExist
+                questions = Question.objects.filter(quiz_id=quiz_id).in_bulk(question_ids)
+                if len(questions) != len(set(question_ids)):
+                    raise Question.DoesNotExist
+
+                updated_fields = {'updated_at'}
+                errors = []
+                for question_id, patch in zip(question_ids, patches):
+                    question = questions[question_id]
+                    serializer = QuestionSerializer(question, data=patch, partial=True)
+                    if not serializer.is_valid():
+                        errors.append(serializer.errors)
+                        continue
+                    errors.append({})
+                    for field, value in serializer.validated_data.items():
+                        setattr(question, field, value)
+                        updated_fields.add(field)
+                    question.updated_at = now
+
+                if any(errors):
+                    transaction.set_rollback(True)
+                    return Response(errors if many else errors[0], status=status.HTTP_400_BAD_REQUEST)
+                Question.objects.bulk_update(questions.values(), sorted(updated_fields))
+
+            caches.invalidate_quiz(quiz_id)
+            serializer = QuestionSerializer([questions[question_id] for question_id in question_ids], many=True)
+            return Response(serializer.data if many else serializer.data[0])
         except Quiz.DoesNotExist:
             return Response({"detail": "Quiz not found."}, status=status.HTTP_404_NOT_FOUND)
         except Question.DoesNotExist:
@@ -98,11 +245,21 @@ class QuestionView(APIView):
 
     def delete(self, request, *args, **kwargs):
         quiz_id = kwargs.get('quiz')
-        question_id = request.data.get('id')
+        # Either a single question ({"id": ...}) or a batch ({"ids": [...]})
+        raw_ids = request.data['ids'] if 'ids' in request.data else [request.data.get('id')]
+        question_ids = _parse_ids(raw_ids) if isinstance(raw_ids, list) else None
+        if question_ids is None:
+            return Response({"detail": "Invalid question id."}, status=status.HTTP_400_BAD_REQUEST)
+
         try:
-            quiz = Quiz.objects.get(pk=quiz_id)
-            question = quiz.questions.get(pk=question_id)
-            question.delete()
+            with transaction.atomic():
+                if not Quiz.objects.filter(pk=quiz_id).exists():
+                    raise Quiz.DoesNotExist
+                deleted, _ = Question.objects.filter(quiz_id=quiz_id, pk__in=question_ids).delete()
+                if deleted != len(set(question_ids)):
+                    raise Question.DoesNotExist
+
+            caches.invalidate_quiz(quiz_id)
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Quiz.DoesNotExist:
             return Response({"detail": "Quiz not found."}, status=status.HTTP_404_NOT_FOUND)
@@ -110,70 +267,143 @@ class QuestionView(APIView):
             return Response({"detail": "Question not found."}, status=status.HTTP_404_NOT_FOUND)
 
 
+def _parse_ids(values):
+    try:
+        return [int(value) for value in values]
+    except (TypeError, ValueError):
+        return None
+
+
+class QuizBundleView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        # The bundle is cached as rendered JSON bytes, so a hit touches neither the database nor a serializer
+        bundle = caches.get_bundle(kwargs.get('quiz'))
+        if bundle is None:
+            return Response({'error': 'Quiz not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return HttpResponse(bundle, content_type='application/json')
+
+
+def own_player_id(user, data):
+    # Games are started, finished and credited as the authenticated player, never as an id taken from the body
+    player_id = data.get('player_id', user.pk)
+    if str(player_id) != str(user.pk):
+        raise PermissionDenied('You can only play as yourself.')
+    return user.pk
+
+
+def read_finish_request(data):
+    # Checked before the game session is consumed, so a malformed request cannot throw the game away
+    try:
+        quiz_id = int(data.get('quiz_id'))
+    except (TypeError, ValueError):
+        raise ValueError('quiz_id must be a quiz id.')
+    answers = data.get('answers') or {}
+    if not isinstance(answers, dict):
+        raise ValueError('answers must map question ids to answers.')
+    return quiz_id, answers
+
+
 class GameStarterView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'start_quiz'
+
+    def get_throttles(self):
+        # Listing the active games stays free, only starting one draws from the bucket
+        return super().get_throttles() if self.request.method == 'POST' else []
+
+    def get(self, request, *args, **kwargs):
+        return Response({'active_quizzes': game_sessions.active_quizzes(request.user.pk)})
 
     def post(self, request, *args, **kwargs):
-        player_id = request.data.get('player_id')
         quiz_id = request.data.get('quiz_id')
 
         try:
+            player_id = own_player_id(request.user, request.data)
             quiz = Quiz.objects.get(pk=quiz_id)
             if not quiz.verified:
                 raise PermissionDenied("Quiz is not verified.")
 
-            if f'player_{player_id}:{quiz_id}' in cache.keys('*'):
+            if not game_sessions.start_game(player_id, quiz):
                 raise PermissionDenied("Quiz already started.")
 
-            cache.set(f'player_{player_id}:{quiz_id}', quiz.score, timeout=int(quiz.available_time.total_seconds()))
-
         except Quiz.DoesNotExist:
             return Response({'error': 'Quiz not found'}, status=status.HTTP_404_NOT_FOUND)
         except PermissionDenied as e:
             return Response({'error': str(e)}, status=status.HTTP_403_FORBIDDEN)
 
+        # Lets the client show the first question without a second round trip
+        if request.data.get('include_questions') is True:
+            bundle = caches.get_bundle(quiz.pk)
+            if bundle is not None:
+                return HttpResponse(bundle, content_type='application/json')
+
         return Response(status=status.HTTP_200_OK)
 
 
 class GameEndView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'finish_quiz'
 
     def post(self, request, *args, **kwargs):
-        player_id = request.data.get('player_id')
-        quiz_id = request.data.get('quiz_id')
-        answers = request.data.get('answers')
+        try:
+            quiz_id, answers = read_finish_request(request.data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            score = cache.get(f'player_{player_id}:{quiz_id}')
-            if score is None:
+            player_id = own_player_id(request.user, request.data)
+            session = game_sessions.finish_game(player_id, quiz_id)
+            if session is None:
                 return Response({'error': 'You did not finish the quiz before timeout.'},
                                 status=status.HTTP_400_BAD_REQUEST)
 
-            quiz = Quiz.objects.get(pk=quiz_id)
-            questions = quiz.questions.all()
-            number_of_questions = questions.count()
-
-            reward = self.calculate_reward(answers, questions, score, number_of_questions)
+            answer_key = caches.get_answer_key(quiz_id)
+            reward = self.calculate_reward(answers, answer_key, session.score)
 
-            player = Player.objects.get(pk=player_id)
-            player.score += reward
-            player.save()
-
-            cache.delete(f'player_{player_id}:{quiz_id}')
+            try:
+                credit_score(player_id, reward)
+            except Player.DoesNotExist:
+                game_sessions.restore_game(player_id, quiz_id, session)
+                raise
+            attempts.record(player_id, quiz_id, answers, reward, session.started_at)
 
             return Response({'score': reward}, status=status.HTTP_200_OK)
 
-        except Quiz.DoesNotExist:
-            return Response({'error': 'Quiz not found.'}, status=status.HTTP_404_NOT_FOUND)
         except Player.DoesNotExist:
             return Response({'error': 'Player not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except PermissionDenied as e:
+            return Response({'error': str(e)}, status=status.HTTP_403_FORBIDDEN)
+
+    def calculate_reward(self, answers, answer_key, score):
+        if not answer_key or not isinstance(answers, dict):
+            return 0
 
-    def calculate_reward(self, answers, questions, score, number_of_questions):
-        reward = 0
+        # A set, so the same question sent under several spellings ("1", "01") counts once
+        correct_answers = set()
         for question_id, answer in answers.items():
             try:
-                if answer == questions.get(pk=int(question_id)).correct_answer:
-                    reward += score / number_of_questions
-            except Question.DoesNotExist:
+                question_id = int(question_id)
+            except (TypeError, ValueError):
                 continue
-        return int(reward)
+            if question_id in answer_key and answer == answer_key[question_id]:
+                correct_answers.add(question_id)
+        return int(score * min(len(correct_answers), len(answer_key)) / len(answer_key))
+
+
+class AttemptHistoryView(ListAPIView):
+    serializer_class = QuizAttemptSerializer
+    pagination_class = AttemptCursorPagination
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        player_id = self.kwargs['player']
+        if player_id != self.request.user.pk and not self.request.user.is_superuser:
+            raise PermissionDenied('You can only view your own attempts.')
+
+        # Served from the (player, finished_at, id) index in the cursor's order
+        return (QuizAttempt.objects.filter(player_id=player_id).select_related('quiz')
+                .only('attempt_id', 'quiz__title', 'answers', 'reward', 'started_at', 'finished_at'))